@@ -1,3 +1,5 @@
+import atexit
+import os
 from flask import Flask
 from flask_cors import CORS
 from routes import *
@@ -15,6 +17,97 @@ app.config['JWT'] = JWTManager(app.config['SECRET_KEY'])
 with app.app_context():
     setup_logging()
 
+# Shared database clients live for the whole worker process
+atexit.register(close_mongo)
+
+@app.cli.command("init-indexes")
+def init_indexes():
+    """Create the required Mongo/MySQL indexes and report full scans"""
+    result = bootstrap_indexes(app.logger)
+    print(f"Mongo indexes: {result['mongo']}")
+    print(f"MySQL indexes created: {result['mysql_created']}")
+    for scan in result["full_scans"]:
+        print(f"Full scan: {scan}")
+
+@app.cli.command("migrate-comments")
+def migrate_comments():
+    """Move embedded posts.comments arrays into the comments collection"""
+    result = migrate_embedded_comments(app.logger)
+    print(f"Moved {result['comments']} comments from {result['posts']} posts")
+
+@app.cli.command("migrate-likes")
+def migrate_likes():
+    """Move embedded users.likes arrays into the likes collection"""
+    result = migrate_embedded_likes(app.logger)
+    print(f"Moved {result['likes']} likes from {result['users']} users")
+
+@app.cli.command("process-media")
+def process_media():
+    """Build the thumbnail/medium variants of post images that have none yet"""
+    result = process_pending_media(app.logger)
+    print(f"Processed media of {result['processed']} posts, {result['failed']} failed")
+
+@app.cli.command("cleanup")
+def cleanup():
+    """Run one batch of the cleanup job right away"""
+    result = run_cleanup(app.logger, force=True)
+    print(f"Cleaned up: {result}")
+
+@app.cli.command("flush-counters")
+def flush_counters_command():
+    """Write the buffered read/like counters to the posts right away"""
+    result = flush_counters()
+    print("Another flush is running" if result is None else f"Flushed counters of {result} posts")
+
+def startup():
+    """
+    One-time work before serving: bucket check, index bootstrap, data
+    migrations and the background workers
+
+    Only runs when the app is served, so CLI commands do not bootstrap twice
+    or start worker threads.
+    """
+    # Check the media bucket once instead of on every upload
+    try:
+        ensure_minio_bucket()
+    except Exception as e:
+        app.logger.warning(f"MinIO bucket check failed at startup, retrying on first upload: {e}")
+
+    # Drop expired entries from the pre-jti token blacklist
+    try:
+        app.config['JWT'].remove_ExpiredToken()
+    except Exception as e:
+        app.logger.warning(f"Legacy token blacklist cleanup failed: {e}")
+
+    # Create and verify the database indexes the routes rely on
+    if Config.get('INDEX_BOOTSTRAP', 'True') == 'True':
+        try:
+            bootstrap_indexes(app.logger)
+        except Exception as e:
+            app.logger.warning(f"Index bootstrap failed at startup: {e}")
+
+    # Comments moved from posts.comments arrays to the comments collection; finish moving them before serving
+    if Config.get('COMMENTS_BACKFILL', 'True') == 'True':
+        try:
+            migrate_embedded_comments(app.logger)
+        except Exception as e:
+            app.logger.warning(f"Comment backfill failed at startup: {e}")
+
+    # Likes moved from users.likes arrays to the likes collection; finish moving them before serving
+    if Config.get('LIKES_BACKFILL', 'True') == 'True':
+        try:
+            migrate_embedded_likes(app.logger)
+        except Exception as e:
+            app.logger.warning(f"Like backfill failed at startup: {e}")
+
+    # Remove what deleted posts and replaced media leave behind, in rate-limited batches
+    if Config.get('CLEANUP_JOB', 'True') == 'True':
+        start_cleanup_worker(app.logger)
+
+    # Write buffered read/like counters to the posts in batches
+    if Config.get('COUNTER_FLUSH_JOB', 'True') == 'True':
+        start_flush_worker(app.logger)
+
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(post_bp, url_prefix='/posts')
@@ -28,6 +121,9 @@ if __name__ == '__main__':
     app.logger.info(f"Starting app on port {Config.get('APP_PORT')}")
 
     mode = Config.get('MODE', 'production')  # 默认生产模式
+    # with the debug reloader only the child process serves requests
+    if mode != 'debug' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup()
 
     if mode == 'debug':
         app.logger.info("Running in debug mode")
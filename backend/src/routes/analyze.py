@@ -119,4 +119,20 @@ def top_ten_user_subscriber():
     except Exception as e:
         error_details = traceback.format_exc()
         current_app.logger.error(f"Top ten user subscriber error for IP {client_ip}: {str(e)}\n{error_details}")
-        return jsonify({"message": "An error occurred during analysis"}), 500
\ No newline at end of file
+        return jsonify({"message": "An error occurred during analysis"}), 500
+
+@analyze_bp.route("/pool_stats", methods=["GET"])
+def pool_stats():
+    try:
+        client_ip = request.remote_addr
+        current_app.logger.info(f"Pool stats request received from IP: {client_ip}")
+        return jsonify({
+            "mongo": mongo_pool_stats(),
+            "mysql": mysql_pool_stats(),
+            "redis": redis_pool_stats(),
+            "token_cache": current_app.config['JWT'].cache_stats(),
+        }), 200
+    except Exception as e:
+        error_details = traceback.format_exc()
+        current_app.logger.error(f"Pool stats error for IP {client_ip}: {str(e)}\n{error_details}")
+        return jsonify({"message": "An error occurred while reading pool stats"}), 500
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from utils.db import connect_mysql, connect_mongo
+from utils.authtool import resolve_user_id
 
 from contextlib import contextmanager
 
@@ -38,15 +39,15 @@ def login():
 
         with connect_mysql() as (cursor, connection):
             current_app.logger.debug(f"Checking credentials for user: {username} from IP: {client_ip}")
-            cursor.execute("SELECT password FROM users WHERE username = %s", (username,))
+            cursor.execute("SELECT user_id, password FROM users WHERE username = %s", (username,))
             result = cursor.fetchone()
             if result is None:
                 current_app.logger.info(f"User not found: {username} - login attempt from IP: {client_ip}")
                 return jsonify({"message": "User not found"}), 404
             
-            user_password = result[0]
+            user_id, user_password = result
             if check_password_hash(user_password, password):
-                token = current_app.config['JWT'].generate_token({"username": username}, 3600)
+                token = current_app.config['JWT'].generate_token({"username": username, "user_id": user_id}, 3600)
                 current_app.logger.info(f"User {username} logged in successfully from IP: {client_ip}")
                 return jsonify({"token": token}), 200
             else:
@@ -105,7 +106,6 @@ def register():
                         "username": username,
                         "user_id": user_id, 
                         "history": [], 
-                        "likes": [], 
                         "Subscriber_to": [],
                         "Subscribers": [],
                         "account_created": str(datetime.now()),
@@ -182,8 +182,12 @@ def renew_token():
 
 
         username = payload.get("username")
+        user_id = resolve_user_id(payload)  # tokens issued before user_id was embedded
+        if user_id is None:
+            current_app.logger.warning(f"Token renewal for unknown user: {username} from IP: {client_ip}")
+            return jsonify({"message": "User not found"}), 404
         current_app.logger.debug(f"Generating new token for user: {username} from IP: {client_ip}")
-        new_token = current_app.config['JWT'].generate_token(payload, 3600)
+        new_token = current_app.config['JWT'].generate_token({"username": username, "user_id": user_id}, 3600)
         current_app.logger.debug(f"Blacklisting old token for user: {username} from IP: {client_ip}")
         current_app.config['JWT'].blacklist_token(token)
         current_app.logger.info(f"Token renewed successfully for user: {username} from IP: {client_ip}")
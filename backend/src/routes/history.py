@@ -1,9 +1,18 @@
 from flask import Blueprint, request, jsonify, current_app
-from utils.db import connect_mysql, connect_mongo, redis_connection
+from utils.db import connect_mysql, connect_mongo, redis_pipeline
+from utils.authtool import auth_check
+from utils.cache import invalidate, user_tags
+from utils.leaderboard import LEADERBOARD_DB, record_read
+from utils.trending import record_event
+from utils.counters import increment
+from utils.env import Config
+from utils.migrations import migrate_user_likes
+from utils.indexes import require_indexes
+from utils.pagination import encode_cursor, decode_cursor
 from datetime import datetime, timezone
 from bson.objectid import ObjectId
 from contextlib import contextmanager
-from functools import wraps
+from pymongo.errors import DuplicateKeyError
 import traceback
 
 history_bp = Blueprint('history', __name__)
@@ -14,35 +23,38 @@ def handle_exception(e, logger, client_ip, message="An error occurred"):
     logger.error(f"Error from IP {client_ip}: {str(e)}\n{error_details}")
     return jsonify({"message": message}), 500
 
-# Enhanced authentication decorator
-def auth_check(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        client_ip = request.remote_addr
-        logger = current_app.logger
-        token = request.headers.get("Authorization")
-        if not token:
-            logger.warning(f"Missing token from IP: {client_ip}")
-            return jsonify({"message": "Missing token"}), 401
-        token = token.split(" ")[1]
-        payload = current_app.config['JWT'].check_token(token)
-        if payload is None:
-            logger.warning(f"Invalid token from IP: {client_ip}")
-            return jsonify({"message": "Invalid token"}), 401
-        
-        # Fetch user_id from MySQL
-        with connect_mysql() as (cursor, connection):
-            cursor.execute("SELECT user_id FROM users WHERE username = %s", (payload["username"],))
-            result = cursor.fetchone()
-            if not result:
-                logger.warning(f"User {payload['username']} not found from IP: {client_ip}")
-                return jsonify({"message": "User not found"}), 404
-            user_id = result[0]
-        
-        kwargs["user_id"] = user_id
-        kwargs["username"] = payload["username"]
-        return f(*args, **kwargs)
-    return decorated_function
+def post_exists(db, post_id):
+    """True when post_id is a well-formed id of an existing post"""
+    return ObjectId.is_valid(post_id) and db["posts"].find_one({"_id": ObjectId(post_id)}, {"_id": 1}) is not None
+
+def history_update(post_id, now):
+    """
+    Pipeline update that moves the timestamp of an already read post in
+    place, or appends the post to the history when it is read for the first time
+    """
+    history = {"$ifNull": ["$history", []]}
+    entry = {"post_id": post_id, "timestamp": now}
+    return [{"$set": {"history": {"$cond": [
+        {"$in": [post_id, {"$ifNull": ["$history.post_id", []]}]},
+        {"$map": {"input": history, "in": {"$cond": [{"$eq": ["$$this.post_id", post_id]}, entry, "$$this"]}}},
+        {"$concatArrays": [history, [entry]]},
+    ]}}}]
+
+def likes_page(db, user_id, per_page, cursor=None):
+    """
+    One page of a user's likes, newest first, by keyset cursor
+
+    Returns:
+        tuple: (list of {"post_id", "timestamp"}, next cursor or None)
+    """
+    query = {"user_id": user_id}
+    if cursor:
+        query.update(decode_cursor(cursor, field="timestamp"))
+    likes = list(db["likes"].find(query, {"post_id": 1, "timestamp": 1}).sort([("timestamp", -1), ("_id", -1)]).limit(per_page + 1))
+    has_more = len(likes) > per_page
+    likes = likes[:per_page]
+    next_cursor = encode_cursor(likes[-1], field="timestamp") if has_more else None
+    return [{"post_id": like["post_id"], "timestamp": like["timestamp"]} for like in likes], next_cursor
 
 @history_bp.route('/get_history_like', methods=['GET'])
 def get_history_like():
@@ -68,7 +80,7 @@ def get_history_like():
         with connect_mongo() as mongo_client:
             collection = mongo_client["users"]
             logger.debug(f"Querying MongoDB for history of user_id: {user_id} from IP: {client_ip}")
-            out = collection.find_one({"user_id": user_id})
+            out = collection.find_one({"user_id": user_id}, {"likes": 0})
             if not out:
                 logger.info(f"No history found for user_id: {user_id} from IP: {client_ip}")
                 return jsonify({"message": "No history found"}), 404
@@ -76,8 +88,8 @@ def get_history_like():
             out["_id"] = str(out["_id"])
             for item in out.get("history", []):
                 item["post_id"] = str(item["post_id"])
-            for item in out.get("likes", []):
-                item["post_id"] = str(item["post_id"])
+            # likes live in their own collection, only the newest page is included here
+            out["likes"], out["likes_next_cursor"] = likes_page(mongo_client, user_id, int(Config.get("LIKES_PER_PAGE", 20)))
             
             logger.info(f"Successfully retrieved history for user: {username} from IP: {client_ip}")
             return jsonify(out), 200
@@ -100,39 +112,35 @@ def add_read_history(user_id, username):
     try:
         with connect_mongo() as mongo_client:
             collection = mongo_client["users"]
-            posts_collection = mongo_client["posts"]
             
-            existing_item = collection.find_one({"user_id": user_id, "history.post_id": post_id})
+            if not post_exists(mongo_client, post_id):
+                logger.info(f"Post not found with ID: {post_id} from IP: {client_ip}")
+                return jsonify({"message": "Post not found"}), 404
+            post_id = str(ObjectId(post_id))
             now = datetime.now(timezone.utc)
             
-            with redis_connection(db=1) as redis_client:
-                read_key = f"post:{post_id}:reads"
-                redis_client.incr(read_key)
-                if redis_client.ttl(read_key) == -1:
-                    redis_client.expire(read_key, 24 * 60 * 60)
+            # one atomic update for both cases; the projection tells whether the post was read before
+            logger.debug(f"Recording read of post {post_id} by user_id: {user_id}")
+            before = collection.find_one_and_update(
+                {"user_id": user_id},
+                history_update(post_id, now),
+                projection={"history": {"$elemMatch": {"post_id": post_id}}}
+            )
+            if before is None:
+                logger.info(f"User not found: {username} from IP: {client_ip}")
+                return jsonify({"message": "User not found"}), 404
             
-            if existing_item:
-                logger.debug(f"Updating timestamp for post {post_id} by user_id: {user_id}")
-                collection.update_one(
-                    {"user_id": user_id, "history.post_id": post_id},
-                    {"$set": {"history.$.timestamp": now}}
-                )
+            with redis_pipeline(db=LEADERBOARD_DB) as pipe:
+                record_read(pipe, post_id, now)
+            record_event(post_id, "read")
+            invalidate(*user_tags(user_id, username))
+            
+            if before.get("history"):
                 logger.info(f"History timestamp updated for user: {username}, post: {post_id}")
                 return jsonify({"message": "History timestamp updated"}), 200
-            else:
-                logger.debug(f"Adding new history for post {post_id} by user_id: {user_id}")
-                collection.update_one(
-                    {"user_id": user_id},
-                    {"$push": {"history": {"post_id": post_id, "timestamp": now}}},
-                    upsert=True
-                )
-                posts_collection.update_one(
-                    {"_id": ObjectId(post_id)},
-                    {"$inc": {"read_count": 1}},
-                    upsert=True
-                )
-                logger.info(f"New history item added for user: {username}, post: {post_id}")
-                return jsonify({"message": "History added"}), 200
+            increment(post_id, "read_count")
+            logger.info(f"New history item added for user: {username}, post: {post_id}")
+            return jsonify({"message": "History added"}), 200
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred while updating read history")
 
@@ -151,25 +159,24 @@ def add_like(user_id, username):
     
     try:
         with connect_mongo() as mongo_client:
-            collection = mongo_client["users"]
-            posts_collection = mongo_client["posts"]
+            collection = mongo_client["likes"]
             
-            existing_item = collection.find_one({"user_id": user_id, "likes.post_id": post_id})
-            if existing_item:
+            if not post_exists(mongo_client, post_id):
+                logger.info(f"Post not found with ID: {post_id} from IP: {client_ip}")
+                return jsonify({"message": "Post not found"}), 404
+            post_id = str(ObjectId(post_id))
+            
+            now = datetime.now(timezone.utc)
+            # the unique (user_id, post_id) index makes check and write one atomic step
+            require_indexes(mongo_client, "likes")
+            try:
+                collection.insert_one({"user_id": user_id, "post_id": post_id, "timestamp": now})
+            except DuplicateKeyError:
                 logger.info(f"Post {post_id} already liked by user: {username}")
                 return jsonify({"message": "You've already liked this post", "already_liked": True}), 200
             
-            now = datetime.now(timezone.utc)
-            collection.update_one(
-                {"user_id": user_id},
-                {"$push": {"likes": {"post_id": post_id, "timestamp": now}}},
-                upsert=True
-            )
-            posts_collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$inc": {"like_count": 1}},
-                upsert=True
-            )
+            increment(post_id, "like_count")
+            record_event(post_id, "like")
             logger.info(f"Like added for post {post_id} by user: {username}")
             return jsonify({"message": "Post liked successfully", "already_liked": False}), 200
     except Exception as e:
@@ -190,28 +197,83 @@ def remove_like(user_id, username):
     
     try:
         with connect_mongo() as mongo_client:
-            collection = mongo_client["users"]
-            post_collection = mongo_client["posts"]
+            collection = mongo_client["likes"]
             
-            existing_item = collection.find_one({"user_id": user_id, "likes.post_id": post_id})
-            if not existing_item:
+            result = collection.delete_one({"user_id": user_id, "post_id": post_id})
+            if not result.deleted_count and migrate_user_likes(mongo_client, user_id):
+                # the like may still have been in the user's embedded array
+                result = collection.delete_one({"user_id": user_id, "post_id": post_id})
+            if not result.deleted_count:
                 logger.info(f"Post {post_id} not liked by user: {username}")
                 return jsonify({"message": "You haven't liked this post"}), 404
             
-            result = collection.update_one(
-                {"user_id": user_id},
-                {"$pull": {"likes": {"post_id": post_id}}}
-            )
-            post_collection.update_one(
-                {"_id": ObjectId(post_id)},
-                {"$inc": {"like_count": -1}}
-            )
-            
-            if result.modified_count > 0:
-                logger.info(f"Like removed for post {post_id} by user: {username}")
-                return jsonify({"message": "Like removed successfully"}), 200
-            else:
-                logger.warning(f"Failed to remove like for post {post_id} by user: {username}")
-                return jsonify({"message": "Failed to remove like"}), 500
+            # the counter only moves when this request actually removed the like
+            increment(post_id, "like_count", -1)
+            record_event(post_id, "like", count=-1)
+            logger.info(f"Like removed for post {post_id} by user: {username}")
+            return jsonify({"message": "Like removed successfully"}), 200
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while removing the like")
+
+@history_bp.route('/get_likes', methods=['GET'])
+def get_likes():
+    '''Get the posts a user liked, newest first, by cursor'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Get likes request from IP: {client_ip}")
+    
+    username = request.args.get("username")
+    page_cursor = request.args.get("cursor")
+    if not username:
+        logger.warning(f"Username missing from IP: {client_ip}")
+        return jsonify({"message": "Username is required"}), 400
+    
+    try:
+        per_page = int(request.args.get("per_page", Config.get("LIKES_PER_PAGE", 20)))
+        if per_page < 1:
+            return jsonify({"message": "per_page must be a positive integer"}), 400
+        per_page = min(per_page, int(Config.get("LIKES_MAX_PER_PAGE", 100)))
+        
+        with connect_mysql() as (cursor, connection):
+            cursor.execute("SELECT user_id FROM users WHERE username = %s", (username,))
+            result = cursor.fetchone()
+            if not result:
+                logger.info(f"User not found: {username} from IP: {client_ip}")
+                return jsonify({"message": "User not found"}), 404
+            user_id = result[0]
+        
+        with connect_mongo() as mongo_client:
+            likes, next_cursor = likes_page(mongo_client, user_id, per_page, page_cursor)
+            logger.info(f"Retrieved {len(likes)} likes of user: {username} from IP: {client_ip}")
+            return jsonify({"likes": likes, "next_cursor": next_cursor}), 200
+    except ValueError:
+        logger.warning(f"Invalid likes pagination parameters from IP: {client_ip}")
+        return jsonify({"message": "Invalid per_page or cursor value"}), 400
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while retrieving likes")
+
+@history_bp.route('/liked', methods=['GET'])
+@auth_check
+def liked(user_id, username):
+    '''Check which of a page of posts the user has liked, in one query'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Liked check request from IP: {client_ip}")
+    
+    post_ids = [i.strip() for i in request.args.get("post_ids", "").split(",") if i.strip()]
+    if not post_ids:
+        logger.warning(f"Post IDs missing from IP: {client_ip}")
+        return jsonify({"message": "Post IDs are required"}), 400
+    if len(post_ids) > int(Config.get("POSTS_MAX_BATCH", 100)):
+        return jsonify({"message": "Too many post IDs"}), 400
+    
+    try:
+        with connect_mongo() as mongo_client:
+            # answered from the (user_id, post_id) index alone
+            found = {like["post_id"] for like in mongo_client["likes"].find(
+                {"user_id": user_id, "post_id": {"$in": post_ids}}, {"_id": 0, "post_id": 1}
+            )}
+        logger.info(f"Checked {len(post_ids)} likes for user: {username} from IP: {client_ip}")
+        return jsonify({"liked": {post_id: post_id in found for post_id in post_ids}}), 200
     except Exception as e:
-        return handle_exception(e, logger, client_ip, "An error occurred while removing the like")
\ No newline at end of file
+        return handle_exception(e, logger, client_ip, "An error occurred while checking likes")
@@ -2,9 +2,22 @@ from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timezone
 from bson.objectid import ObjectId
 from contextlib import contextmanager
-from functools import wraps
 from .history import add_read_history
-from utils.db import connect_mysql, connect_mongo, connect_Minio, redis_connection
+from utils.db import connect_mongo, connect_Minio, redis_connection
+from utils.authtool import auth_check
+from utils.env import Config
+from utils.cache import cached_json, invalidate, post_tag
+from utils.timeline import timeline_add, timeline_remove, timeline_page
+from utils.leaderboard import WINDOWS as LEADERBOARD_WINDOWS, top_posts
+from utils.trending import record_event, trending_posts
+from utils.counters import merge_pending
+from utils.pagination import encode_cursor, decode_cursor
+from utils.media import UploadError, start_upload, finish_upload, discard_upload, store_media
+from utils.cleanup import forget_media, post_media_key, schedule_post_cleanup
+from utils.media_pipeline import needs_variants, media_update, schedule_media
+import hashlib
+import json
+import re
 import traceback
 
 post_bp = Blueprint('post', __name__)
@@ -15,36 +28,6 @@ def handle_exception(e, logger, client_ip, message="An error occurred"):
     logger.error(f"Error from IP {client_ip}: {str(e)}\n{error_details}")
     return jsonify({"message": message}), 500
 
-# Enhanced authentication decorator
-def auth_check(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        client_ip = request.remote_addr
-        logger = current_app.logger
-        token = request.headers.get("Authorization")
-        if not token:
-            logger.warning(f"Missing token from IP: {client_ip}")
-            return jsonify({"message": "Token is required"}), 400
-        token = token.split(" ")[1]
-        payload = current_app.config['JWT'].check_token(token)
-        if payload is None:
-            logger.warning(f"Invalid token from IP: {client_ip}")
-            return jsonify({"message": "Invalid token"}), 401
-        
-        # Fetch user_id from MySQL
-        with connect_mysql() as (cursor, connection):
-            cursor.execute("SELECT user_id FROM users WHERE username = %s", (payload["username"],))
-            result = cursor.fetchone()
-            if not result:
-                logger.warning(f"User {payload['username']} not found from IP: {client_ip}")
-                return jsonify({"message": "User not found"}), 404
-            user_id = result[0]
-        
-        kwargs["user_id"] = user_id
-        kwargs["username"] = payload["username"]
-        return f(*args, **kwargs)
-    return decorated_function
-
 @post_bp.route("/create_post", methods=["POST"])
 @auth_check
 def create_post(user_id, username):
@@ -63,19 +46,11 @@ def create_post(user_id, username):
     
     try:
         media_url = ""
+        filename = None
         if media_file:
             with connect_Minio() as (minio_client, bucket_name, url):
-                buckets = [b.name for b in minio_client.list_buckets()]
-                if bucket_name not in buckets:
-                    logger.debug(f"Creating new bucket: {bucket_name} from IP: {client_ip}")
-                    minio_client.make_bucket(bucket_name)
-                
-                filename = f"{user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{media_file.filename}"
-                logger.debug(f"Uploading file: {filename} to MinIO from IP: {client_ip}")
-                media_file.stream.seek(0)
-                minio_client.put_object(
-                    bucket_name, filename, media_file.stream, length=-1, part_size=10*1024*1024
-                )
+                logger.debug(f"Storing file: {media_file.filename} in MinIO from IP: {client_ip}")
+                filename = store_media(minio_client, bucket_name, media_file.stream, media_file.filename, media_file.content_type)
                 media_url = f"{url}/{filename}"
                 logger.debug(f"Media URL created: {media_url} from IP: {client_ip}")
         
@@ -86,19 +61,75 @@ def create_post(user_id, username):
                 "media_url": media_url,
                 "content": content,
                 "user_id": user_id,
-                "comments": [],
                 "comment_count": 0,
                 "created_at": datetime.now(timezone.utc),
                 "like_count": 0,
                 "read_count": 0
             }
+            if filename:
+                post["media_key"] = filename
+                if needs_variants(filename):
+                    post["media_status"] = "processing"
             result = collection.insert_one(post)
             post_id = str(result.inserted_id)
+            timeline_add(post_id, post["created_at"])
+            if filename:
+                schedule_media(result.inserted_id, filename, media_url)
             logger.info(f"Post created with ID: {post_id} by user: {username} from IP: {client_ip}")
             return jsonify({"message": "Post created", "post_id": post_id}), 200
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred while creating the post")
 
+def count_posts(collection, query, mode):
+    """
+    Count the posts matching a query
+
+    Args:
+        mode (str): "exact" runs count_documents, "estimated" uses the collection
+            metadata for unfiltered queries, "cached" keeps exact counts in Redis
+            for POSTS_COUNT_CACHE_TTL seconds, "none" skips counting
+    """
+    if mode == "none":
+        return None
+    if mode == "estimated" and not query:
+        return collection.estimated_document_count()
+    if mode in ("estimated", "cached"):
+        key = "posts:count:" + hashlib.sha1(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()
+        with redis_connection(db=2) as redis_client:
+            cached = redis_client.get(key)
+            if cached is not None:
+                return int(cached)
+            total = collection.count_documents(query)
+            redis_client.set(key, total, ex=int(Config.get("POSTS_COUNT_CACHE_TTL", 60)))
+            return total
+    return collection.count_documents(query)
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+def parse_projection(default_exclude=()):
+    """
+    Build a Mongo projection from the fields= / exclude= query parameters
+
+    Args:
+        default_exclude (tuple): fields left out when the caller asks for neither
+
+    Returns:
+        tuple: (projection or None, error message or None)
+    """
+    fields = request.args.get("fields")
+    exclude = request.args.get("exclude")
+    if fields is not None and exclude is not None:
+        return None, "Use either fields or exclude, not both"
+    names = fields if fields is not None else exclude
+    if names is None:
+        return ({name: 0 for name in default_exclude} or None), None
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    if any(not _FIELD_NAME.match(name) for name in names):
+        return None, "Invalid field name"
+    if fields is not None:
+        return dict({name: 1 for name in names}, _id=1), None
+    return ({name: 0 for name in names if name != "_id"} or None), None
+
 @post_bp.route("/get_posts", methods=["GET"])
 def get_posts():
     '''Get a filtered, paginated list of posts'''
@@ -111,10 +142,23 @@ def get_posts():
         post_per_page = int(request.args.get("per_page", 10))
         user_id = request.args.get("user_id")
         search_term = request.args.get("search")
+        sort_mode = request.args.get("sort", "relevance" if search_term else "recent")
+        cursor = request.args.get("cursor")  # present (even empty) switches to keyset pagination
+        requested_totals = request.args.get("totals")
+        totals = requested_totals or ("exact" if cursor is None else "none")
         
         if post_page < 1 or post_per_page < 1:
             logger.warning(f"Invalid pagination parameters from IP: {client_ip}")
             return jsonify({"message": "Page and per_page must be positive integers"}), 400
+        if totals not in ("exact", "estimated", "cached", "none"):
+            return jsonify({"message": "totals must be one of exact, estimated, cached, none"}), 400
+        if sort_mode not in ("recent", "relevance"):
+            return jsonify({"message": "sort must be recent or relevance"}), 400
+        post_per_page = min(post_per_page, int(Config.get("POSTS_MAX_PER_PAGE", 50)))
+        # feeds leave out the unbounded comments array unless asked for, comment_count stays
+        projection, error = parse_projection(default_exclude=("comments",))
+        if error:
+            return jsonify({"message": error}), 400
         
         query = {}
         if user_id:
@@ -127,16 +171,54 @@ def get_posts():
         
         if search_term:
             logger.debug(f"Searching posts with term: {search_term} from IP: {client_ip}")
-            query["$or"] = [
-                {"title": {"$regex": search_term, "$options": "i"}},
-                {"content": {"$regex": search_term, "$options": "i"}}
-            ]
+            # served by the title/content text index, kept up to date by Mongo on every write
+            query["$text"] = {"$search": search_term}
         
         with connect_mongo() as mongo_client:
             collection = mongo_client["posts"]
-            posts = collection.find(query).sort("created_at", -1).skip((post_page - 1) * post_per_page).limit(post_per_page)
-            posts_list = [dict(post, _id=str(post["_id"])) for post in posts]
-            total_posts = collection.count_documents(query)
+            order = [("created_at", -1), ("_id", -1)]
+            if search_term and sort_mode == "relevance" and cursor is None:
+                projection = dict(projection or {}, score={"$meta": "textScore"})
+                order = [("score", {"$meta": "textScore"}), ("_id", -1)]
+
+            if cursor is not None:
+                # created_at is needed to build next_cursor, whatever fields/exclude asked for
+                if projection and 1 in projection.values():
+                    projection["created_at"] = 1
+                elif projection:
+                    projection.pop("created_at", None)
+                    projection = projection or None
+                find_query = query
+                if cursor:
+                    find_query = dict(query, **decode_cursor(cursor))
+                # one extra document tells whether there is a next page
+                posts = list(collection.find(find_query, projection).sort(order).limit(post_per_page + 1))
+                has_more = len(posts) > post_per_page
+                posts = posts[:post_per_page]
+                posts_list = merge_pending([dict(post, _id=str(post["_id"])) for post in posts])
+                logger.info(f"Successfully retrieved {len(posts_list)} posts by cursor from IP: {client_ip}")
+                return jsonify({
+                    "posts": posts_list,
+                    "next_cursor": encode_cursor(posts[-1]) if has_more else None,
+                    "pagination": {
+                        "total": count_posts(collection, query, totals),
+                        "per_page": post_per_page
+                    }
+                }), 200
+
+            post_ids = None
+            if not query:
+                # newest-first pages of the unfiltered feed come from the Redis timeline
+                post_ids = timeline_page((post_page - 1) * post_per_page, post_per_page)
+            if post_ids is not None:
+                found = {str(post["_id"]): post for post in collection.find({"_id": {"$in": [ObjectId(i) for i in post_ids]}}, projection)}
+                posts = [found[i] for i in post_ids if i in found]
+                # by default the collection metadata count stands in for the unfiltered feed, it costs no scan
+                total_posts = count_posts(collection, query, requested_totals or "estimated")
+            else:
+                posts = collection.find(query, projection).sort(order).skip((post_page - 1) * post_per_page).limit(post_per_page)
+                total_posts = count_posts(collection, query, totals)
+            posts_list = merge_pending([dict(post, _id=str(post["_id"])) for post in posts])
             
             logger.info(f"Successfully retrieved {len(posts_list)} posts from IP: {client_ip}")
             return jsonify({
@@ -145,12 +227,12 @@ def get_posts():
                     "total": total_posts,
                     "page": post_page,
                     "per_page": post_per_page,
-                    "pages": (total_posts + post_per_page - 1) // post_per_page
+                    "pages": (total_posts + post_per_page - 1) // post_per_page if total_posts is not None else None
                 }
             }), 200
     except ValueError:
         logger.warning(f"Invalid pagination parameters from IP: {client_ip}")
-        return jsonify({"message": "Invalid page or per_page value"}), 400
+        return jsonify({"message": "Invalid page, per_page or cursor value"}), 400
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred during post retrieval")
 
@@ -165,20 +247,66 @@ def get_post():
     if not post_id:
         logger.warning(f"Post ID missing from IP: {client_ip}")
         return jsonify({"message": "Post ID is required"}), 400
+    projection, error = parse_projection()
+    if error:
+        return jsonify({"message": error}), 400
     
-    try:
+    def load_post():
         with connect_mongo() as mongo_client:
             collection = mongo_client["posts"]
-            post = collection.find_one({"_id": ObjectId(post_id)})
+            post = collection.find_one({"_id": ObjectId(post_id)}, projection)
             if not post:
                 logger.info(f"Post not found with ID: {post_id} from IP: {client_ip}")
-                return jsonify({"message": "Post not found"}), 404
+                return {"message": "Post not found"}, 404
             post["_id"] = str(post["_id"])
             logger.info(f"Post retrieved successfully with ID: {post_id} from IP: {client_ip}")
-            return jsonify({"post": post}), 200
+            return {"post": post}, 200
+
+    def live_counts(payload):
+        # read/like deltas that are not flushed yet do not invalidate the cached post
+        merge_pending([payload["post"]])
+        return payload
+
+    try:
+        key = f"post:{post_id}:{request.args.get('fields')}:{request.args.get('exclude')}"
+        return cached_json(key, [post_tag(post_id)], int(Config.get("CACHE_TTL_POST", 60)), load_post, live_counts)
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred while retrieving the post")
 
+@post_bp.route("/get_posts_by_ids", methods=["GET"])
+def get_posts_by_ids():
+    '''Get many posts by post_id in one query, in the order they were asked for'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Get posts by ids request from IP: {client_ip}")
+
+    post_ids = [i.strip() for i in request.args.get("post_ids", "").split(",") if i.strip()]
+    if not post_ids:
+        logger.warning(f"Post IDs missing from IP: {client_ip}")
+        return jsonify({"message": "Post IDs are required"}), 400
+    if len(post_ids) > int(Config.get("POSTS_MAX_BATCH", 100)):
+        return jsonify({"message": "Too many post IDs"}), 400
+    projection, error = parse_projection(default_exclude=("comments",))
+    if error:
+        return jsonify({"message": error}), 400
+
+    try:
+        # malformed ids cannot match anything, they are reported as not found
+        object_ids = list({ObjectId(i) for i in post_ids if ObjectId.is_valid(i)})
+        with connect_mongo() as mongo_client:
+            found = {}
+            if object_ids:
+                for post in mongo_client["posts"].find({"_id": {"$in": object_ids}}, projection):
+                    post["_id"] = str(post["_id"])
+                    found[post["_id"]] = post
+        merge_pending(list(found.values()))
+        posts = [found.get(i.lower()) for i in post_ids]
+        not_found = [i for i, post in zip(post_ids, posts) if post is None]
+        logger.info(f"Retrieved {len(found)} of {len(post_ids)} posts by ID from IP: {client_ip}")
+        return jsonify({"posts": posts, "not_found": not_found}), 200
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while retrieving the posts")
+
 @post_bp.route("/delete_post", methods=["DELETE"])
 @auth_check
 def delete_post(user_id, username):
@@ -203,6 +331,11 @@ def delete_post(user_id, username):
                 logger.warning(f"Unauthorized delete attempt by user_id: {user_id} for post ID: {post_id}")
                 return jsonify({"message": "Unauthorized"}), 403
             collection.delete_one({"_id": ObjectId(post_id)})
+            # comments, read counters, history and likes are removed in bulk by the cleanup job
+            schedule_post_cleanup(post_id)
+            forget_media(mongo_client, post_media_key(post))
+            invalidate(post_tag(post_id))
+            timeline_remove(post_id)
             logger.info(f"Post deleted with ID: {post_id} by user: {username} from IP: {client_ip}")
             return jsonify({"message": "Post deleted"}), 200
     except Exception as e:
@@ -244,22 +377,21 @@ def update_post(user_id, username):
             
             if media_file:
                 with connect_Minio() as (minio_client, bucket_name, url):
-                    buckets = [b.name for b in minio_client.list_buckets()]
-                    if bucket_name not in buckets:
-                        logger.debug(f"Creating new bucket: {bucket_name} from IP: {client_ip}")
-                        minio_client.make_bucket(bucket_name)
-                    
-                    filename = f"{user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{media_file.filename}"
-                    logger.debug(f"Uploading new media file: {filename} to MinIO from IP: {client_ip}")
-                    media_file.stream.seek(0)
-                    minio_client.put_object(
-                        bucket_name, filename, media_file.stream, length=-1, part_size=10*1024*1024
-                    )
+                    logger.debug(f"Storing new media file: {media_file.filename} in MinIO from IP: {client_ip}")
+                    filename = store_media(minio_client, bucket_name, media_file.stream, media_file.filename, media_file.content_type)
                     update_data["media_url"] = f"{url}/{filename}"
                     logger.debug(f"New media URL created: {update_data['media_url']} from IP: {client_ip}")
             
             if update_data:
-                collection.update_one({"_id": ObjectId(post_id)}, {"$set": update_data})
+                update = {"$set": update_data}
+                if "media_url" in update_data:
+                    update = media_update(filename, update_data["media_url"])
+                    update["$set"].update(update_data)
+                collection.update_one({"_id": ObjectId(post_id)}, update)
+                invalidate(post_tag(post_id))
+                if "media_url" in update_data:
+                    forget_media(mongo_client, post_media_key(post))
+                    schedule_media(ObjectId(post_id), filename, update_data["media_url"])
                 logger.info(f"Post updated with ID: {post_id} by user: {username} from IP: {client_ip}")
                 return jsonify({"message": "Post updated"}), 200
             else:
@@ -268,6 +400,65 @@ def update_post(user_id, username):
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred while updating the post")
 
+@post_bp.route("/upload_media/init", methods=["POST"])
+@auth_check
+def upload_media_init(user_id, username):
+    '''Hand out a presigned URL so the browser uploads media straight to MinIO'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Upload init request from IP: {client_ip}")
+
+    filename = request.form.get("filename", "").strip()
+    if not filename:
+        logger.warning(f"Filename missing from IP: {client_ip}")
+        return jsonify({"message": "Filename is required"}), 400
+
+    try:
+        upload = start_upload(user_id, filename, request.form.get("content_type"), request.form.get("sha256"))
+        logger.info(f"Upload {upload['upload_id']} started by user: {username} from IP: {client_ip}")
+        return jsonify(upload), 200
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while starting the upload")
+
+@post_bp.route("/upload_media/complete", methods=["POST"])
+@auth_check
+def upload_media_complete(user_id, username):
+    '''Attach a finished direct upload to a post'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Upload complete request from IP: {client_ip}")
+
+    post_id = request.args.get("post_id")
+    upload_id = request.form.get("upload_id", "").strip()
+    if not post_id or not upload_id:
+        logger.warning(f"Post ID or upload ID missing from IP: {client_ip}")
+        return jsonify({"message": "Post ID and upload ID are required"}), 400
+
+    try:
+        with connect_mongo() as mongo_client:
+            collection = mongo_client["posts"]
+            post = collection.find_one({"_id": ObjectId(post_id)}, {"user_id": 1, "media_key": 1, "media_url": 1})
+            if not post:
+                logger.info(f"Post not found with ID: {post_id} from IP: {client_ip}")
+                return jsonify({"message": "Post not found"}), 404
+            if post["user_id"] != user_id:
+                logger.warning(f"Unauthorized upload attach by user_id: {user_id} for post ID: {post_id}")
+                return jsonify({"message": "Unauthorized"}), 403
+            try:
+                object_name, media_url = finish_upload(user_id, upload_id)
+            except UploadError as e:
+                logger.warning(f"Upload {upload_id} rejected for post ID: {post_id} from IP: {client_ip}: {e.message}")
+                return jsonify({"message": e.message}), e.status
+            collection.update_one({"_id": ObjectId(post_id)}, media_update(object_name, media_url))
+            discard_upload(upload_id)
+            invalidate(post_tag(post_id))
+            forget_media(mongo_client, post_media_key(post))
+            schedule_media(ObjectId(post_id), object_name, media_url)
+            logger.info(f"Upload {object_name} attached to post ID: {post_id} by user: {username} from IP: {client_ip}")
+            return jsonify({"message": "Media attached", "media_url": media_url}), 200
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while attaching the upload")
+
 @post_bp.route("/create_comment", methods=["POST"])
 @auth_check
 def create_comment(user_id, username):
@@ -286,42 +477,120 @@ def create_comment(user_id, username):
     try:
         with connect_mongo() as mongo_client:
             collection = mongo_client["posts"]
-            comment_obj = {
-                "comment": comment,
-                "user_id": user_id,
-                "created_at": datetime.now(timezone.utc)
-            }
+            # the counter is bumped first, so a comment is only stored for an existing post
             result = collection.update_one(
                 {"_id": ObjectId(post_id)},
-                {"$push": {"comments": comment_obj}, "$inc": {"comment_count": 1}}
+                {"$inc": {"comment_count": 1}}
             )
             if result.matched_count == 0:
                 logger.info(f"Post not found with ID: {post_id} from IP: {client_ip}")
                 return jsonify({"message": "Post not found"}), 404
+            comment_obj = {
+                "post_id": ObjectId(post_id),
+                "comment": comment,
+                "user_id": user_id,
+                "created_at": datetime.now(timezone.utc)
+            }
+            try:
+                comment_id = mongo_client["comments"].insert_one(comment_obj).inserted_id
+            except Exception:
+                collection.update_one({"_id": ObjectId(post_id)}, {"$inc": {"comment_count": -1}})
+                raise
+            invalidate(post_tag(post_id))  # comment_count changed
+            record_event(post_id, "comment")
             logger.info(f"Comment created for post ID: {post_id} by user: {username} from IP: {client_ip}")
-            return jsonify({"message": "Comment created"}), 200
+            return jsonify({"message": "Comment created", "comment_id": str(comment_id)}), 200
     except Exception as e:
         return handle_exception(e, logger, client_ip, "An error occurred while creating the comment")
 
+@post_bp.route("/get_comments", methods=["GET"])
+def get_comments():
+    '''Get the comments of a post, oldest first, by cursor'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Get comments request from IP: {client_ip}")
+    
+    post_id = request.args.get("post_id")
+    cursor = request.args.get("cursor")
+    if not post_id:
+        logger.warning(f"Post ID missing from IP: {client_ip}")
+        return jsonify({"message": "Post ID is required"}), 400
+    
+    try:
+        per_page = int(request.args.get("per_page", 20))
+        if per_page < 1:
+            return jsonify({"message": "per_page must be a positive integer"}), 400
+        per_page = min(per_page, int(Config.get("COMMENTS_MAX_PER_PAGE", 100)))
+        query = {"post_id": ObjectId(post_id)}
+        if cursor:
+            query.update(decode_cursor(cursor, descending=False))
+        
+        with connect_mongo() as mongo_client:
+            comments = list(
+                mongo_client["comments"].find(query).sort([("created_at", 1), ("_id", 1)]).limit(per_page + 1)
+            )
+            has_more = len(comments) > per_page
+            comments = comments[:per_page]
+            next_cursor = encode_cursor(comments[-1]) if has_more else None
+            comments_list = [dict(c, _id=str(c["_id"]), post_id=str(c["post_id"])) for c in comments]
+            logger.info(f"Retrieved {len(comments_list)} comments for post ID: {post_id} from IP: {client_ip}")
+            return jsonify({"comments": comments_list, "next_cursor": next_cursor}), 200
+    except ValueError:
+        logger.warning(f"Invalid comment pagination parameters from IP: {client_ip}")
+        return jsonify({"message": "Invalid per_page or cursor value"}), 400
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while retrieving comments")
+
 @post_bp.route("/most_read_today", methods=["GET"])
 def most_read_today():
-    '''Get the most read posts today from Redis'''
+    '''Get the most read posts of today, the last hour or the last 7 days from Redis'''
     client_ip = request.remote_addr
     logger = current_app.logger
     logger.info(f"Most read posts request from IP: {client_ip}")
     
+    window = request.args.get("window", "today")
+    if window not in LEADERBOARD_WINDOWS:
+        return jsonify({"message": "window must be one of hour, today, week"}), 400
     try:
-        with redis_connection(db=1) as redis_client:
-            post_keys = redis_client.keys("post:*:reads")
-            if not post_keys:
-                logger.info(f"No posts read today from IP: {client_ip}")
-                return jsonify({"message": "No posts read today", "top_posts": []}), 200
-            
-            post_counts = {key.split(":")[1]: int(redis_client.get(key)) for key in post_keys}
-            sorted_posts = sorted(post_counts.items(), key=lambda x: x[1], reverse=True)
-            top_posts = [{"post_id": post_id, "read_count": count} for post_id, count in sorted_posts[:10]]
-            
-            logger.info(f"Top posts retrieved from IP: {client_ip}")
-            return jsonify({"message": "Top posts retrieved", "top_posts": top_posts}), 200
+        limit = int(request.args.get("limit", 10))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "limit must be a positive integer"}), 400
+    limit = min(limit, int(Config.get("LEADERBOARD_MAX_LIMIT", 100)))
+    
+    try:
+        ranking = top_posts(window, limit)
+        if not ranking:
+            logger.info(f"No posts read in window {window} from IP: {client_ip}")
+            message = "No posts read today" if window == "today" else f"No posts read in the last {window}"
+            return jsonify({"message": message, "top_posts": []}), 200
+        
+        top = [{"post_id": post_id, "read_count": count} for post_id, count in ranking]
+        logger.info(f"Top posts for window {window} retrieved from IP: {client_ip}")
+        return jsonify({"message": "Top posts retrieved", "top_posts": top}), 200
+    except Exception as e:
+        return handle_exception(e, logger, client_ip, "An error occurred while retrieving most read posts")
+
+@post_bp.route("/trending", methods=["GET"])
+def trending():
+    '''Get the posts with the highest time-decayed engagement score'''
+    client_ip = request.remote_addr
+    logger = current_app.logger
+    logger.info(f"Trending posts request from IP: {client_ip}")
+
+    try:
+        limit = int(request.args.get("limit", 10))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "limit must be a positive integer"}), 400
+    limit = min(limit, int(Config.get("LEADERBOARD_MAX_LIMIT", 100)))
+
+    try:
+        ranking = trending_posts(limit)
+        posts = [{"post_id": post_id, "score": score} for post_id, score in ranking]
+        logger.info(f"Trending posts retrieved from IP: {client_ip}")
+        return jsonify({"message": "Trending posts retrieved", "trending": posts}), 200
     except Exception as e:
-        return handle_exception(e, logger, client_ip, "An error occurred while retrieving most read posts")
\ No newline at end of file
+        return handle_exception(e, logger, client_ip, "An error occurred while retrieving trending posts")
@@ -1,7 +1,12 @@
-from .authtool import JWTManager
-from .db import connect_mysql, connect_mongo, connect_Minio, redis_connection
+from .authtool import JWTManager, auth_check
+from .db import connect_mysql, connect_mongo, connect_Minio, redis_connection, redis_pipeline, mongo_pool_stats, mysql_pool_stats, redis_pool_stats, close_mongo, ensure_minio_bucket
+from .indexes import bootstrap_indexes
+from .migrations import migrate_embedded_comments, migrate_embedded_likes
+from .media_pipeline import process_pending_media
+from .cleanup import run_cleanup, start_cleanup_worker
+from .counters import flush_counters, start_flush_worker
 from .env import Config 
 from .log import setup_logging
 
-__all__ = ["JWTManager", "connect_mysql", "connect_mongo", "connect_Minio", "redis_connection", "Config", "setup_logging"]
+__all__ = ["JWTManager", "auth_check", "connect_mysql", "connect_mongo", "connect_Minio", "redis_connection", "redis_pipeline", "mongo_pool_stats", "mysql_pool_stats", "redis_pool_stats", "close_mongo", "ensure_minio_bucket", "bootstrap_indexes", "migrate_embedded_comments", "migrate_embedded_likes", "process_pending_media", "run_cleanup", "start_cleanup_worker", "flush_counters", "start_flush_worker", "Config", "setup_logging"]
 Config = Config
\ No newline at end of file
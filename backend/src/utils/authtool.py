@@ -1,10 +1,70 @@
 import jwt
+import uuid
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Any
-from .db import redis_connection
+from functools import wraps
+from typing import Dict, Any, Optional
+from .db import redis_connection, connect_mysql
 from .env import Config
 
-from flask import current_app
+from flask import current_app, request, jsonify
+
+class TokenCache:
+    """Per-process LRU of tokens that already passed signature, expiry and revocation checks"""
+    def __init__(self, max_size: int, max_age: int):
+        """
+        Args:
+            max_size (int): maximum number of cached tokens
+            max_age (int): seconds an entry may be served before it is re-checked
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        # keys revoked while their check was in flight must not be cached afterwards
+        self._revoked = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key: str, payload: Dict[str, Any]) -> None:
+        # never serve a token past its own exp
+        expires_at = min(payload.get("exp", 0), time.time() + self.max_age)
+        with self._lock:
+            if key in self._revoked:
+                return
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._revoked[key] = True
+            while len(self._revoked) > self.max_size:
+                self._revoked.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    def __len__(self):
+        return len(self._entries)
 
 class JWTManager:
     """JWT 管理类，用于生成和解码 JWT Token"""
@@ -18,14 +78,26 @@ class JWTManager:
         """
         self.secret = secret
         self.algorithm = algorithm
-        self._blacklist = "jwt_blacklist"
+        self._blacklist = "jwt_blacklist"  # legacy set, only read for tokens without jti
+        self._revoked_prefix = "jwt_revoked:"
+        self._revocation_channel = "jwt_revocations"
+        # optional cache of verified tokens, kept in sync through Redis pub/sub
+        self._cache = None
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        if Config.get("TOKEN_CACHE", "False") == "True":
+            self._cache = TokenCache(
+                int(Config.get("TOKEN_CACHE_SIZE", 10000)),
+                int(Config.get("TOKEN_CACHE_MAX_AGE", 300)),
+            )
 
     def generate_token(self, payload: Dict[str, Any], expiration: int) -> str:
         """
         Generate JWT Token
         
         Args:
-            payload (Dict[str, Any]): Data to encode (e.g., user information)
+            payload (Dict[str, Any]): Data to encode, should carry "username" and "user_id"
             expiration (int): Token expiration time in seconds
         
         Returns:
@@ -33,7 +105,10 @@ class JWTManager:
         """
         
         token_payload = payload.copy()
-        token_payload["exp"] = datetime.utcnow() + timedelta(seconds=expiration)
+        token_payload["iat"] = datetime.utcnow()
+        token_payload["exp"] = token_payload["iat"] + timedelta(seconds=expiration)
+        # every token gets its own id so it can be revoked on its own
+        token_payload["jti"] = uuid.uuid4().hex
         current_app.logger.info(f"Generating token with payload: {token_payload}")
         # PyJWT encode returns bytes in newer versions (3.x), so we convert to string
         token = jwt.encode(token_payload, self.secret, algorithm=self.algorithm)
@@ -42,49 +117,170 @@ class JWTManager:
             return token.decode('utf-8')
         return token
 
+    def token_id(self, token: str, payload: Dict[str, Any]) -> str:
+        """
+        Return the revocation id of a token: its jti, or a hash of the
+        token for tokens issued before jti was added
+        """
+        return payload.get("jti") or hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _on_revocation(self, message) -> None:
+        self._cache.discard(message["data"])
+
+    def _on_listener_error(self, error, pubsub, thread) -> None:
+        # a missed revocation must not be served from cache: drop it and resubscribe on next check
+        thread.stop()
+        pubsub.close()
+        with self._listener_lock:
+            self._listener = None
+        self._cache.clear()
+
+    def _cache_ready(self) -> bool:
+        """Make sure this process listens for revocations before its cache is used"""
+        if self._cache is None:
+            return False
+        if self._listener is not None and self._listener_pid == os.getpid():
+            return True
+        with self._listener_lock:
+            if self._listener is None or self._listener_pid != os.getpid():
+                # after fork the parent's listener thread does not exist in the child
+                self._cache.clear()
+                try:
+                    with redis_connection(0) as redis_client:
+                        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                        pubsub.subscribe(**{self._revocation_channel: self._on_revocation})
+                        self._listener = pubsub.run_in_thread(
+                            sleep_time=1, daemon=True, exception_handler=self._on_listener_error
+                        )
+                        self._listener_pid = os.getpid()
+                except Exception:
+                    self._listener = None
+                    return False
+        return True
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Size and state of the verified-token cache of this worker"""
+        return {
+            "enabled": self._cache is not None,
+            "size": len(self._cache) if self._cache is not None else 0,
+            "listening": self._listener is not None and self._listener_pid == os.getpid(),
+        }
+
     def check_token(self, token: str) -> Dict[str, Any]:
             """
             检查 JWT Token 是否有效
             
             Args:
                 token (str): 要检查的 Token
-                redis_host (str): Redis 主机地址
-                redis_port (int): Redis 端口
-                redis_db (int): Redis 数据库编号
             
             Returns:
-                Dict[str, Any]: 解码后的 Token 数据
+                Dict[str, Any]: 解码后的 Token 数据, 无效或已撤销时返回 None
             """
-            with redis_connection(0) as redis_client:
-                try:
-                    if redis_client.sismember(self._blacklist, token):
-                        return None
-                    payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            use_cache = self._cache_ready()
+            cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+            if use_cache:
+                payload = self._cache.get(cache_key)
+                if payload is not None:
                     return payload
-                except Exception as e:
+            try:
+                # signature and expiry are checked first so bad tokens never reach Redis
+                payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+            except jwt.InvalidTokenError:
+                return None
+            with redis_connection(0) as redis_client:
+                if redis_client.exists(self._revoked_prefix + self.token_id(token, payload)):
                     return None
+                if "jti" not in payload and redis_client.sismember(self._blacklist, token):
+                    return None
+            if use_cache:
+                self._cache.put(cache_key, payload)
+            return payload
     
     def blacklist_token(self, token: str) -> None:
         """
         将 Token 加入黑名单
+
+        The revocation is stored as its own key that expires together with
+        the token, so the blacklist never outgrows the live tokens. Every
+        worker is told over pub/sub to drop the token from its cache.
         
         Args:
             token (str): 要加入黑名单的 Token
         """
+        try:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except jwt.ExpiredSignatureError:
+            return None  # already unusable, nothing to store
+        remaining = int(payload["exp"] - time.time()) + 1
+        if remaining <= 0:
+            return None
+        cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
         with redis_connection(0) as redis:
-            current_app.logger.info(f"Blacklisting token: {token}")
-            # set ttl
-            redis.sadd(self._blacklist, token)
+            current_app.logger.info(f"Blacklisting token {self.token_id(token, payload)} for {remaining}s")
+            redis.set(self._revoked_prefix + self.token_id(token, payload), 1, ex=remaining)
+            redis.publish(self._revocation_channel, cache_key)
+        if self._cache is not None:
+            self._cache.discard(cache_key)
         return None
     
     def remove_ExpiredToken(self) -> None:
         """
         清除过期 Token
+
+        Only the legacy jwt_blacklist set needs this; per-token keys expire on their own.
         """
         with redis_connection(0) as redis_client:
-                    blacklisted_tokens = redis_client.smembers(self._blacklist)
-                    for token in blacklisted_tokens:
-                        payload = self.check_token(token, 0)
-                        if payload is None:
-                            redis_client.srem(self._blacklist, token)
+            for token in redis_client.sscan_iter(self._blacklist):
+                try:
+                    jwt.decode(token, self.secret, algorithms=[self.algorithm])
+                except Exception:
+                    redis_client.srem(self._blacklist, token)
         return None
+
+def resolve_user_id(payload: Dict[str, Any]) -> Optional[int]:
+    """
+    Get the user_id of a decoded token
+
+    Tokens issued before user_id was embedded only carry the username, for
+    those the id is looked up in MySQL.
+
+    Returns:
+        Optional[int]: the user_id, None if the user does not exist
+    """
+    if payload.get("user_id") is not None:
+        return payload["user_id"]
+    with connect_mysql() as (cursor, connection):
+        cursor.execute("SELECT user_id FROM users WHERE username = %s", (payload.get("username"),))
+        result = cursor.fetchone()
+    return result[0] if result else None
+
+def auth_check(f):
+    """
+    Require a valid JWT and pass the caller's identity to the view
+
+    The view receives user_id and username as keyword arguments, both
+    read from the token itself.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        client_ip = request.remote_addr
+        logger = current_app.logger
+        token = request.headers.get("Authorization")
+        if not token:
+            logger.warning(f"Missing token from IP: {client_ip}")
+            return jsonify({"message": "Missing token"}), 401
+        token = token.split(" ")[-1]
+        payload = current_app.config['JWT'].check_token(token)
+        if payload is None:
+            logger.warning(f"Invalid token from IP: {client_ip}")
+            return jsonify({"message": "Invalid token"}), 401
+
+        user_id = resolve_user_id(payload)
+        if user_id is None:
+            logger.warning(f"User {payload.get('username')} not found from IP: {client_ip}")
+            return jsonify({"message": "User not found"}), 404
+
+        kwargs["user_id"] = user_id
+        kwargs["username"] = payload.get("username")
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,108 @@
+# src\backend\src\utils\cache.py
+import json
+import logging
+from flask import current_app
+from .db import redis_connection, redis_pipeline
+from .env import Config
+
+# Response bodies live in their own Redis DB next to the other cached values
+CACHE_DB = 2
+_ENTRY_PREFIX = "cache:entry:"
+_TAG_PREFIX = "cache:tag:"
+# tag versions must outlive every entry that was stored under them
+_TAG_TTL = 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+def _enabled():
+    return Config.get("RESPONSE_CACHE", "True") == "True"
+
+def cache_lookup(key, tags):
+    """
+    Read a cached response body together with the current versions of its tags
+
+    An entry is only a hit when it was stored under the tag versions that
+    are current now, so a write that bumped a tag while the entry was being
+    built can never be hidden by it.
+
+    Returns:
+        tuple: (body or None, versions to pass to cache_store)
+    """
+    if not _enabled():
+        return None, None
+    try:
+        with redis_connection(CACHE_DB) as redis_client:
+            values = redis_client.mget([_ENTRY_PREFIX + key] + [_TAG_PREFIX + tag for tag in tags])
+    except Exception as e:
+        logger.warning(f"Cache lookup failed for {key}: {e}")
+        return None, None
+    versions = [int(v or 0) for v in values[1:]]
+    if values[0] is not None:
+        entry = json.loads(values[0])
+        if entry["v"] == versions:
+            return entry["body"], versions
+    return None, versions
+
+def cache_store(key, versions, body, ttl):
+    """Store a response body under the tag versions read by cache_lookup"""
+    if versions is None:
+        return
+    if len(body) > int(Config.get("CACHE_MAX_ENTRY_BYTES", 65536)):
+        return  # oversized bodies would crowd out everything else
+    try:
+        with redis_connection(CACHE_DB) as redis_client:
+            redis_client.set(_ENTRY_PREFIX + key, json.dumps({"v": versions, "body": body}), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Cache store failed for {key}: {e}")
+
+def invalidate(*tags):
+    """Invalidate every cached response carrying one of the tags"""
+    if not tags:
+        return
+    try:
+        with redis_pipeline(CACHE_DB) as pipe:
+            for tag in tags:
+                pipe.incr(_TAG_PREFIX + tag)
+                pipe.expire(_TAG_PREFIX + tag, _TAG_TTL)
+    except Exception as e:
+        logger.error(f"Cache invalidation failed for {tags}: {e}")
+
+def cached_json(key, tags, ttl, loader, fresh=None):
+    """
+    Read-through cache for a JSON endpoint
+
+    Args:
+        key (str): cache key of the response
+        tags (list): invalidation tags, e.g. ["post:<id>"]
+        ttl (int): seconds the response may be served from cache
+        loader (callable): returns (payload, status); only 200 answers are cached
+        fresh (callable): optional, applied to every 200 payload after the cache,
+            for values that change too often to invalidate on, e.g. counters
+
+    Returns:
+        Response: the JSON response, from cache or freshly built
+    """
+    body, versions = cache_lookup(key, tags)
+    if body is not None:
+        if fresh:
+            body = current_app.json.dumps(fresh(json.loads(body)))
+        return current_app.response_class(body, status=200, mimetype="application/json")
+    payload, status = loader()
+    body = current_app.json.dumps(payload)
+    if status == 200:
+        cache_store(key, versions, body, ttl)
+        if fresh:
+            body = current_app.json.dumps(fresh(payload))
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+def post_tag(post_id):
+    return f"post:{post_id}"
+
+def user_tags(user_id=None, username=None):
+    """Tags of a user's cached info; entries looked up by id or by name carry one of them each"""
+    tags = []
+    if user_id is not None:
+        tags.append(f"user:{user_id}")
+    if username is not None:
+        tags.append(f"user:name:{username}")
+    return tags
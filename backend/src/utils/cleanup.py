@@ -0,0 +1,209 @@
+# src\backend\src\utils\cleanup.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from minio.deleteobjects import DeleteObject
+from .cache import invalidate, user_tags
+from .db import connect_mongo, connect_Minio, redis_connection, redis_pipeline
+from .env import Config
+from .leaderboard import bucket_keys
+from .media import MEDIA_PREFIX, TEMP_PREFIX, release_media
+from .media_pipeline import VARIANTS, variant_name
+from .trending import remove_posts as remove_trending
+
+# Work queued by requests and done in bulk by the cleanup job
+CLEANUP_DB = 1
+_POSTS_KEY = "cleanup:posts"      # ids of deleted posts
+_OBJECTS_KEY = "cleanup:objects"  # MinIO objects from before content addressing, owned by a single post
+_LOCK_KEY = "cleanup:lock"
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+
+def _interval():
+    return int(Config.get("CLEANUP_INTERVAL", 30))
+
+def _batch_size():
+    return int(Config.get("CLEANUP_BATCH_SIZE", 100))
+
+def post_media_key(post):
+    """Object name of a post's media, also for posts stored before media_key existed"""
+    if post.get("media_key"):
+        return post["media_key"]
+    marker = f"/{Config.get('MINIO_BUCKET')}/"
+    if marker in (post.get("media_url") or ""):
+        return post["media_url"].split(marker, 1)[1]
+    return None
+
+def forget_media(db, key):
+    """A post stopped using this object: release shared media, queue single-owner media for deletion"""
+    if not key:
+        return
+    if key.startswith(MEDIA_PREFIX):
+        release_media(db, key)
+    elif not key.startswith(TEMP_PREFIX):  # direct uploads are removed when the media workers adopt them
+        try:
+            with redis_connection(CLEANUP_DB) as redis_client:
+                redis_client.sadd(_OBJECTS_KEY, key)
+        except Exception as e:
+            logger.error(f"Could not queue media {key} for cleanup: {e}")
+
+def schedule_post_cleanup(post_id):
+    """Queue what a deleted post leaves behind: comments, likes, read counters and history entries"""
+    try:
+        with redis_connection(CLEANUP_DB) as redis_client:
+            redis_client.sadd(_POSTS_KEY, str(post_id))
+    except Exception as e:
+        logger.error(f"Could not queue post {post_id} for cleanup: {e}")
+
+def _remove_objects(minio_client, bucket_name, names):
+    """Delete objects in one multi-object request; returns the names that could not be deleted"""
+    errors = minio_client.remove_objects(bucket_name, [DeleteObject(name) for name in names])
+    return {error.name for error in errors}  # the result is lazy, iterating it sends the request
+
+def _cleanup_posts(batch):
+    with redis_connection(CLEANUP_DB) as redis_client:
+        post_ids = redis_client.spop(_POSTS_KEY, batch) or []
+    if not post_ids:
+        return 0
+    try:
+        with connect_mongo() as db:
+            object_ids = [ObjectId(i) for i in post_ids if ObjectId.is_valid(i)]
+            db["comments"].delete_many({"post_id": {"$in": object_ids}})
+            db["likes"].delete_many({"post_id": {"$in": post_ids}})
+            users = list(db["users"].find({"history.post_id": {"$in": post_ids}}, {"user_id": 1, "username": 1}))
+            if users:
+                db["users"].update_many(
+                    {"_id": {"$in": [user["_id"] for user in users]}},
+                    {"$pull": {"history": {"post_id": {"$in": post_ids}}}},
+                )
+        with redis_pipeline(CLEANUP_DB) as pipe:
+            pipe.delete(*[f"post:{post_id}:reads" for post_id in post_ids])  # counters from before the leaderboard
+            for key in bucket_keys():
+                pipe.zrem(key, *post_ids)
+            remove_trending(pipe, post_ids)
+        invalidate(*[tag for user in users for tag in user_tags(user.get("user_id"), user.get("username"))])
+    except Exception:
+        with redis_connection(CLEANUP_DB) as redis_client:
+            redis_client.sadd(_POSTS_KEY, *post_ids)  # retried on the next run
+        raise
+    return len(post_ids)
+
+def _cleanup_objects(batch):
+    with redis_connection(CLEANUP_DB) as redis_client:
+        names = redis_client.spop(_OBJECTS_KEY, batch) or []
+    if not names:
+        return 0
+    # pre-hash images got variants from process_pending_media too
+    variants = {name: [variant_name(name, variant) for variant in VARIANTS] for name in names}
+    with connect_Minio() as (minio_client, bucket_name, url):
+        failed = _remove_objects(minio_client, bucket_name, names + [v for name in names for v in variants[name]])
+    # an object goes back on the queue, variants included, when any of its deletes failed
+    failed = [name for name in names if name in failed or failed.intersection(variants[name])]
+    if failed:
+        with redis_connection(CLEANUP_DB) as redis_client:
+            redis_client.sadd(_OBJECTS_KEY, *failed)
+    return len(names) - len(failed)
+
+def _cleanup_media(batch):
+    """Delete content-addressed media no post has referenced for MEDIA_RELEASE_GRACE seconds"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=int(Config.get("MEDIA_RELEASE_GRACE", 3600)))
+    with connect_mongo() as db:
+        media = db["media"]
+        unreferenced = {"refs": {"$lte": 0}, "released_at": {"$lt": cutoff}, "state": {"$ne": "deleting"}}
+        candidates = [doc["_id"] for doc in media.find(unreferenced, {"_id": 1}).limit(batch)]
+        if candidates:
+            # from here on acquire_media will not hand these out again
+            media.update_many(dict(unreferenced, _id={"$in": candidates}), {"$set": {"state": "deleting"}})
+        # includes objects whose deletion was interrupted before
+        keys = [doc["_id"] for doc in media.find({"state": "deleting"}, {"_id": 1}).limit(batch)]
+        if not keys:
+            return 0
+        names = keys + [variant_name(key, variant) for key in keys for variant in VARIANTS]
+        with connect_Minio() as (minio_client, bucket_name, url):
+            failed = _remove_objects(minio_client, bucket_name, names)
+        done = [key for key in keys if key not in failed]
+        media.delete_many({"_id": {"$in": done}, "state": "deleting"})
+    return len(done)
+
+def _cleanup_uploads(batch):
+    """Delete direct uploads that were never attached to a post"""
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=int(Config.get("UPLOAD_URL_EXPIRY", 900)) + int(Config.get("MEDIA_RELEASE_GRACE", 3600))
+    )
+    with connect_Minio() as (minio_client, bucket_name, url):
+        stale = []
+        for obj in minio_client.list_objects(bucket_name, prefix=TEMP_PREFIX, recursive=True):
+            if obj.last_modified and obj.last_modified < cutoff:
+                stale.append(obj.object_name)
+                if len(stale) >= batch:
+                    break
+        if not stale:
+            return 0
+        with connect_mongo() as db:
+            # attached but not adopted yet, the media workers still own these
+            attached = {post["media_key"] for post in db["posts"].find({"media_key": {"$in": stale}}, {"media_key": 1})}
+        names = [name for name in stale if name not in attached]
+        if not names:
+            return 0
+        failed = _remove_objects(minio_client, bucket_name, names)
+    return len(names) - len(failed)
+
+def run_cleanup(logger=None, force=False):
+    """
+    Do one batch of every kind of queued cleanup
+
+    At most one run starts per CLEANUP_INTERVAL across all processes, and each
+    step handles at most CLEANUP_BATCH_SIZE items, which keeps the load the
+    job puts on Mongo, Redis and MinIO bounded.
+
+    Returns:
+        Dict[str, int] or None: items cleaned per kind, None when another run holds the slot
+    """
+    logger = logger or logging.getLogger(__name__)
+    if not force:
+        with redis_connection(CLEANUP_DB) as redis_client:
+            if not redis_client.set(_LOCK_KEY, os.getpid(), nx=True, ex=_interval()):
+                return None
+    batch = _batch_size()
+    result = {}
+    for name, step in (("posts", _cleanup_posts), ("objects", _cleanup_objects),
+                       ("media", _cleanup_media), ("uploads", _cleanup_uploads)):
+        try:
+            result[name] = step(batch)
+        except Exception as e:
+            result[name] = 0
+            logger.error(f"Cleanup of {name} failed: {e}")
+    if any(result.values()):
+        logger.info(f"Cleanup removed {result}")
+    return result
+
+def start_cleanup_worker(logger=None):
+    """Run the cleanup job every CLEANUP_INTERVAL seconds on a daemon thread"""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+    logger = logger or logging.getLogger(__name__)
+
+    def loop():
+        while True:
+            time.sleep(_interval())
+            try:
+                run_cleanup(logger)
+            except Exception as e:
+                logger.error(f"Cleanup run failed: {e}")
+
+    _worker = threading.Thread(target=loop, name="cleanup", daemon=True)
+    _worker.start()
+    return _worker
+
+def _reset_after_fork():
+    global _worker
+    _worker = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,170 @@
+# src\backend\src\utils\counters.py
+import logging
+import os
+import threading
+import time
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .cache import invalidate, post_tag
+from .db import connect_mongo, redis_connection, redis_pipeline
+from .env import Config
+
+# Write-behind post counters. Requests add their deltas to one Redis hash
+# ("<post_id>:<field>" -> delta) instead of updating the post document, and a
+# flush turns everything collected since the last one into a single bulk_write
+# of $inc operations. Hot posts no longer serialize on their document.
+COUNTERS_DB = 1
+FIELDS = ("read_count", "like_count")
+_PENDING_KEY = "counters:pending"
+_FLUSHING_KEY = "counters:flushing"  # batch taken by a flush that has not been written yet
+_SINCE_KEY = "counters:since"        # when the oldest pending delta was added
+_LOCK_KEY = "counters:lock"
+
+# Moves the pending deltas aside in one step, so increments arriving during
+# the flush start a new batch. A batch left over by a failed flush is retried first.
+_TAKE = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('DEL', KEYS[3])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+
+def _interval():
+    return float(Config.get("COUNTER_FLUSH_INTERVAL", 5))
+
+def _max_staleness():
+    return float(Config.get("COUNTER_MAX_STALENESS", 30))
+
+def increment(post_id, field, amount=1):
+    """
+    Add to a post counter without touching the post document
+
+    Flushes right away when the oldest pending delta is older than
+    COUNTER_MAX_STALENESS, e.g. when no flush worker is running. Falls back
+    to a direct $inc when Redis is unavailable.
+    """
+    post_id = str(ObjectId(post_id))
+    now = time.time()
+    try:
+        with redis_pipeline(COUNTERS_DB) as pipe:
+            pipe.hincrby(_PENDING_KEY, f"{post_id}:{field}", amount)
+            pipe.set(_SINCE_KEY, now, nx=True)
+            pipe.get(_SINCE_KEY)
+            since = pipe.execute()[-1]
+    except Exception as e:
+        logger.warning(f"Buffering {field} of post {post_id} failed, writing it directly: {e}")
+        with connect_mongo() as db:
+            db["posts"].update_one({"_id": ObjectId(post_id)}, {"$inc": {field: amount}})
+        invalidate(post_tag(post_id))
+        return
+    if since is not None and now - float(since) > _max_staleness():
+        try:
+            flush_counters()
+        except Exception as e:
+            logger.error(f"Counter flush failed: {e}")
+
+def merge_pending(posts):
+    """
+    Add the deltas that are not flushed yet to post dicts (with string _id), in place
+
+    Only counters the post dict already carries are touched, so projections
+    that left them out stay as they are.
+
+    Returns:
+        list: the same posts
+    """
+    wanted = [(post, field) for post in posts if post for field in FIELDS if field in post]
+    if not wanted:
+        return posts
+    names = [f"{post['_id']}:{field}" for post, field in wanted]
+    try:
+        with redis_pipeline(COUNTERS_DB) as pipe:
+            pipe.hmget(_PENDING_KEY, names)
+            pipe.hmget(_FLUSHING_KEY, names)
+            pending, flushing = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not read pending counters: {e}")
+        return posts
+    for (post, field), a, b in zip(wanted, pending, flushing):
+        post[field] = (post[field] or 0) + int(a or 0) + int(b or 0)
+    return posts
+
+def flush_counters():
+    """
+    Write the pending counter deltas to Mongo in one unordered bulk_write
+
+    Only one flush runs at a time across all processes.
+
+    Returns:
+        int or None: number of posts updated, None when another flush is running
+    """
+    with redis_connection(COUNTERS_DB) as redis_client:
+        if not redis_client.set(_LOCK_KEY, os.getpid(), nx=True, ex=60):
+            return None
+        try:
+            taken = redis_client.register_script(_TAKE)(keys=[_PENDING_KEY, _FLUSHING_KEY, _SINCE_KEY])
+            deltas = {}
+            for name, value in zip(taken[0::2], taken[1::2]):
+                post_id, field = name.rsplit(":", 1)
+                if int(value) and ObjectId.is_valid(post_id):
+                    deltas.setdefault(post_id, {})[field] = int(value)
+            if not deltas:
+                redis_client.delete(_FLUSHING_KEY)
+                return 0
+            post_ids = list(deltas)
+            requests = [UpdateOne({"_id": ObjectId(post_id)}, {"$inc": deltas[post_id]}) for post_id in post_ids]
+            failed = []
+            try:
+                with connect_mongo() as db:
+                    db["posts"].bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # the other operations were applied, only the failed ones go back to the queue
+                failed = [post_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+                logger.error(f"Counter flush failed for {len(failed)} posts: {failed}")
+            with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(_FLUSHING_KEY)
+                for post_id in failed:
+                    for field, value in deltas[post_id].items():
+                        pipe.hincrby(_PENDING_KEY, f"{post_id}:{field}", value)
+                if failed:
+                    pipe.set(_SINCE_KEY, time.time(), nx=True)
+                pipe.execute()
+        finally:
+            redis_client.delete(_LOCK_KEY)
+    invalidate(*[post_tag(post_id) for post_id in post_ids if post_id not in failed])
+    return len(post_ids) - len(failed)
+
+def start_flush_worker(logger=None):
+    """Flush the pending counters every COUNTER_FLUSH_INTERVAL seconds on a daemon thread"""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return _worker
+    logger = logger or logging.getLogger(__name__)
+
+    def loop():
+        while True:
+            time.sleep(_interval())
+            try:
+                flush_counters()
+            except Exception as e:
+                logger.error(f"Counter flush failed: {e}")
+
+    _worker = threading.Thread(target=loop, name="counters", daemon=True)
+    _worker.start()
+    return _worker
+
+def _reset_after_fork():
+    global _worker
+    _worker = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,87 +1,469 @@
 # src\backend\src\utils\db.py
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
 import pymongo
 import redis
 import os
+import threading
+import time
+import urllib3
+from pymongo import monitoring
 from .env import Config
 
 from contextlib import contextmanager
 from minio import Minio
 
+_mysql_pool = None
+_mysql_lock = threading.Lock()
+_mysql_stats_lock = threading.Lock()
+_mysql_overflow_in_use = 0
+
+def _new_mysql_stats():
+    return {
+        "checkouts": 0,
+        "pooled_checkouts": 0,
+        "overflow_checkouts": 0,
+        "direct_checkouts": 0,
+        "checkout_timeouts": 0,
+        "health_check_failures": 0,
+        "in_use": 0,
+        "wait_ms_total": 0.0,
+        "wait_ms_max": 0.0,
+    }
+
+_mysql_stats = _new_mysql_stats()
+
+def _mysql_params():
+    return {
+        "host": Config.get("MYSQL_HOST"),
+        "user": Config.get("MYSQL_USER"),
+        "password": Config.get("MYSQL_PASSWORD"),
+        "database": Config.get("MYSQL_DATABASE"),
+    }
+
+def _mysql_pooled():
+    # MYSQL_POOL_MODE=direct restores the old connection-per-call behaviour
+    return Config.get("MYSQL_POOL_MODE", "pooled") != "direct"
+
+def _get_mysql_pool():
+    """Return the process-wide MySQL connection pool, creating it on first use"""
+    global _mysql_pool
+    if _mysql_pool is None:
+        with _mysql_lock:
+            if _mysql_pool is None:
+                size = int(Config.get("MYSQL_POOL_SIZE", 10))
+                _mysql_pool = pooling.MySQLConnectionPool(
+                    pool_name=f"backend_{os.getpid()}",
+                    pool_size=max(1, min(size, pooling.CNX_POOL_MAXSIZE)),
+                    pool_reset_session=True,
+                    **_mysql_params(),
+                )
+    return _mysql_pool
+
+def _record_mysql_checkout(kind, waited_ms):
+    with _mysql_stats_lock:
+        _mysql_stats["checkouts"] += 1
+        _mysql_stats[kind] += 1
+        _mysql_stats["in_use"] += 1
+        _mysql_stats["wait_ms_total"] += waited_ms
+        _mysql_stats["wait_ms_max"] = max(_mysql_stats["wait_ms_max"], waited_ms)
+
+def _checkout_mysql():
+    """
+    Take a MySQL connection from the pool
+
+    The pool pings each connection on checkout and reconnects it if the
+    server dropped it. When every pooled connection is busy, up to
+    MYSQL_POOL_OVERFLOW extra connections are opened directly, after that
+    the caller waits up to MYSQL_POOL_TIMEOUT seconds for a free one.
+
+    Returns:
+        tuple: (connection, overflow) where overflow marks a non-pooled connection
+    """
+    global _mysql_overflow_in_use
+    start = time.monotonic()
+    if not _mysql_pooled():
+        connection = mysql.connector.connect(**_mysql_params())
+        _record_mysql_checkout("direct_checkouts", 0.0)
+        return connection, False
+
+    pool = _get_mysql_pool()
+    max_overflow = int(Config.get("MYSQL_POOL_OVERFLOW", 5))
+    deadline = start + float(Config.get("MYSQL_POOL_TIMEOUT", 5))
+    while True:
+        try:
+            connection = pool.get_connection()
+            kind, overflow = "pooled_checkouts", False
+            break
+        except PoolError:
+            with _mysql_stats_lock:
+                can_overflow = _mysql_overflow_in_use < max_overflow
+                if can_overflow:
+                    _mysql_overflow_in_use += 1
+            if can_overflow:
+                try:
+                    connection = mysql.connector.connect(**_mysql_params())
+                except Error:
+                    with _mysql_stats_lock:
+                        _mysql_overflow_in_use -= 1
+                    raise
+                kind, overflow = "overflow_checkouts", True
+                break
+            if time.monotonic() >= deadline:
+                with _mysql_stats_lock:
+                    _mysql_stats["checkout_timeouts"] += 1
+                raise
+            time.sleep(0.01)
+        except Error:
+            # get_connection failed to reconnect a stale pooled connection
+            with _mysql_stats_lock:
+                _mysql_stats["health_check_failures"] += 1
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+    _record_mysql_checkout(kind, (time.monotonic() - start) * 1000)
+    return connection, overflow
+
+def _release_mysql(connection, overflow):
+    """Return a pooled connection to the pool, or close a direct/overflow one"""
+    global _mysql_overflow_in_use
+    try:
+        connection.close()
+    finally:
+        with _mysql_stats_lock:
+            _mysql_stats["in_use"] -= 1
+            if overflow:
+                _mysql_overflow_in_use -= 1
+
+def mysql_pool_stats():
+    """Return the MySQL pool counters and settings of this worker"""
+    with _mysql_stats_lock:
+        stats = dict(_mysql_stats)
+        stats["overflow_in_use"] = _mysql_overflow_in_use
+    stats["pid"] = os.getpid()
+    stats["mode"] = "pooled" if _mysql_pooled() else "direct"
+    stats["pool_size"] = _mysql_pool.pool_size if _mysql_pool is not None else 0
+    stats["max_overflow"] = int(Config.get("MYSQL_POOL_OVERFLOW", 5))
+    if stats["checkouts"]:
+        stats["wait_ms_avg"] = stats["wait_ms_total"] / stats["checkouts"]
+    return stats
+
 @contextmanager
 def connect_mysql():
     connection = None
+    cursor = None
+    overflow = False
     try:
-        connection = mysql.connector.connect(
-            host=Config.get("MYSQL_HOST"),
-            user=Config.get("MYSQL_USER"),
-            password=Config.get("MYSQL_PASSWORD"),
-            database=Config.get("MYSQL_DATABASE"),
-        )
+        connection, overflow = _checkout_mysql()
         cursor = connection.cursor()
         yield (cursor, connection)
         connection.commit()
     except Error as e:
-        connection.rollback()
+        if connection is not None:
+            connection.rollback()
         print(f"The error '{e}' occurred")
         raise  # Re-raise the exception to be handled by the caller
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection is not None:
+            if cursor is not None:
+                cursor.close()
+            _release_mysql(connection, overflow)
+
+class MongoPoolStats(monitoring.ConnectionPoolListener):
+    """Collect connection pool counters for the shared MongoClient"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "connections_created": 0,
+                "connections_closed": 0,
+                "checkouts": 0,
+                "checkins": 0,
+                "checkout_failures": 0,
+                "checked_out": 0,
+                "pools_cleared": 0,
+            }
+
+    def _bump(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump("connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump("checkout_failures")
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.counters["checkouts"] += 1
+            self.counters["checked_out"] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.counters["checkins"] += 1
+            self.counters["checked_out"] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+_mongo_client = None
+_mongo_lock = threading.Lock()
+_mongo_stats = MongoPoolStats()
+
+def get_mongo_client():
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _mongo_client
+    if _mongo_client is None:
+        with _mongo_lock:
+            if _mongo_client is None:
+                _mongo_client = pymongo.MongoClient(
+                    Config.get("MONGO_URL"),
+                    maxPoolSize=int(Config.get("MONGO_MAX_POOL_SIZE", 100)),
+                    minPoolSize=int(Config.get("MONGO_MIN_POOL_SIZE", 0)),
+                    maxIdleTimeMS=int(Config.get("MONGO_MAX_IDLE_TIME_MS", 300000)),
+                    waitQueueTimeoutMS=int(Config.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+                    event_listeners=[_mongo_stats],
+                )
+    return _mongo_client
+
+def close_mongo():
+    """Close the shared MongoClient (e.g. on shutdown)"""
+    global _mongo_client
+    with _mongo_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+def _reset_after_fork():
+    # Pooled sockets are not fork-safe: the child must never reuse the parent's connections
+    global _mongo_client, _mongo_lock, _mysql_pool, _mysql_lock, _mysql_stats_lock
+    global _mysql_stats, _mysql_overflow_in_use, _minio_client, _minio_signer, _minio_lock, _minio_bucket_lock
+    _mongo_client = None
+    _mongo_lock = threading.Lock()
+    _mongo_stats.reset()
+    _mysql_pool = None
+    _mysql_lock = threading.Lock()
+    _mysql_stats_lock = threading.Lock()
+    _mysql_stats = _new_mysql_stats()
+    _mysql_overflow_in_use = 0
+    _minio_client = None
+    _minio_signer = None
+    _minio_lock = threading.Lock()
+    _minio_bucket_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def mongo_pool_stats():
+    """Return the Mongo connection pool counters and settings of this worker"""
+    stats = _mongo_stats.snapshot()
+    stats["pid"] = os.getpid()
+    stats["connected"] = _mongo_client is not None
+    if _mongo_client is not None:
+        options = _mongo_client.options.pool_options
+        stats["max_pool_size"] = options.max_pool_size
+        stats["min_pool_size"] = options.min_pool_size
+        stats["wait_queue_timeout"] = options.wait_queue_timeout
+    return stats
 
 @contextmanager
 def connect_mongo():
-    client = None
     try:
-        client = pymongo.MongoClient(Config.get("MONGO_URL"))
+        client = get_mongo_client()
         db = client[Config.get("MONGO_DATABASE")]
         yield db
     except Exception as e:
         print(f"Unexpected error: {e}")
         raise
-    finally:
-        if client:
-            client.close()
+
+_minio_client = None
+_minio_signer = None
+_minio_lock = threading.Lock()
+_minio_bucket_lock = threading.Lock()
+_minio_bucket_ready = False
+
+def get_minio_client():
+    """Return the process-wide MinIO client, creating it on first use"""
+    global _minio_client
+    if _minio_client is None:
+        with _minio_lock:
+            if _minio_client is None:
+                # transient network errors and 5xx answers are retried with exponential backoff
+                retries = urllib3.Retry(
+                    total=int(Config.get("MINIO_RETRIES", 3)),
+                    backoff_factor=float(Config.get("MINIO_RETRY_BACKOFF", 0.2)),
+                    status_forcelist=[500, 502, 503, 504],
+                )
+                http_client = urllib3.PoolManager(
+                    timeout=urllib3.Timeout(connect=5, read=60),
+                    maxsize=int(Config.get("MINIO_MAX_CONNECTIONS", 10)),
+                    retries=retries,
+                )
+                _minio_client = Minio(Config.get("MINIO_ENDPOINT"),
+                    access_key=Config.get("MINIO_ACCESS_KEY"),
+                    secret_key=Config.get("MINIO_SECRET_KEY"),
+                    secure=False,
+                    http_client=http_client,
+                )
+    return _minio_client
+
+def _minio_public_endpoint():
+    """host:port of MinIO as seen by browsers"""
+    if Config.get("MINIO_PUBLIC_ENDPOINT"):
+        return Config.get("MINIO_PUBLIC_ENDPOINT")
+    if Config.get("DOCKER") == "True":
+        return "localhost:9000"
+    return Config.get("MINIO_ENDPOINT")
+
+def minio_public_url():
+    """Base URL of the media bucket as seen by browsers"""
+    return f"http://{_minio_public_endpoint()}/{Config.get('MINIO_BUCKET')}"
+
+def get_minio_signer():
+    """
+    Return a MinIO client for presigning URLs that browsers use directly
+
+    Presigned URLs are signed for the host they are sent to, so this client
+    points at the public endpoint. It only signs locally and never connects:
+    the region is configured so no bucket location lookup is needed.
+    """
+    global _minio_signer
+    if _minio_signer is None:
+        with _minio_lock:
+            if _minio_signer is None:
+                _minio_signer = Minio(_minio_public_endpoint(),
+                    access_key=Config.get("MINIO_ACCESS_KEY"),
+                    secret_key=Config.get("MINIO_SECRET_KEY"),
+                    secure=False,
+                    region=Config.get("MINIO_REGION", "us-east-1"),
+                )
+    return _minio_signer
+
+def ensure_minio_bucket():
+    """Create the media bucket if it is missing; checked once per process"""
+    global _minio_bucket_ready
+    if not _minio_bucket_ready:
+        client = get_minio_client()
+        with _minio_bucket_lock:
+            if not _minio_bucket_ready:
+                bucket_name = Config.get("MINIO_BUCKET")
+                if not client.bucket_exists(bucket_name):
+                    client.make_bucket(bucket_name)
+                _minio_bucket_ready = True
+    return _minio_bucket_ready
 
 @contextmanager
 #Minio connection
 def connect_Minio():
     try:
-        minioClient = Minio(Config.get("MINIO_ENDPOINT"),
-            access_key=Config.get("MINIO_ACCESS_KEY"),
-            secret_key=Config.get("MINIO_SECRET_KEY"),
-            secure=False
-        )
+        minioClient = get_minio_client()
+        ensure_minio_bucket()
         bucket_name = Config.get("MINIO_BUCKET")
-        docker = Config.get("DOCKER")
-        if docker == "True":
-            #if we are running in a docker container
-            url = f"http://localhost:9000/{bucket_name}"
-        else:
-            url = f"http://{Config.get("MINIO_ENDPOINT")}/{bucket_name}"
-        yield minioClient, bucket_name, url
+        yield minioClient, bucket_name, minio_public_url()
     except Exception as e:
         print(f"Unexpected error: {e}")
         raise
 
         
+_redis_pools = {}
+_redis_lock = threading.Lock()
+
+def _get_redis_pool(db: int):
+    """Return the shared ConnectionPool for a logical Redis DB, creating it on first use"""
+    pool = _redis_pools.get(db)
+    if pool is None:
+        with _redis_lock:
+            pool = _redis_pools.get(db)
+            if pool is None:
+                options = {
+                    "db": db,
+                    "decode_responses": True,  # 确保返回字符串而不是字节
+                    "max_connections": int(Config.get("REDIS_MAX_CONNECTIONS", 50)),
+                    "health_check_interval": int(Config.get("REDIS_HEALTH_CHECK_INTERVAL", 30)),
+                }
+                socket_path = Config.get("REDIS_SOCKET")
+                if socket_path:
+                    # unix socket skips the TCP stack when Redis runs on the same host
+                    pool = redis.ConnectionPool(
+                        connection_class=redis.UnixDomainSocketConnection,
+                        path=socket_path,
+                        **options
+                    )
+                else:
+                    pool = redis.ConnectionPool(
+                        host=Config.get("REDIS_HOST"),
+                        port=Config.get("REDIS_PORT"),
+                        socket_keepalive=Config.get("REDIS_SOCKET_KEEPALIVE", "True") == "True",
+                        **options
+                    )
+                _redis_pools[db] = pool
+    return pool
+
+def redis_pool_stats():
+    """Return connection counts of every Redis pool in this worker"""
+    stats = {"pid": os.getpid(), "pools": {}}
+    for db, pool in list(_redis_pools.items()):
+        stats["pools"][str(db)] = {
+            "max_connections": pool.max_connections,
+            "created": getattr(pool, "_created_connections", None),
+            "available": len(getattr(pool, "_available_connections", [])),
+            "in_use": len(getattr(pool, "_in_use_connections", [])),
+        }
+    return stats
+
 @contextmanager
 def redis_connection(db: int = 0):
-    # 创建 Redis 连接
-    client = redis.Redis(
-        host=Config.get("REDIS_HOST"),
-        port=Config.get("REDIS_PORT"),
-        db  = db,
-        decode_responses=True  # 确保返回字符串而不是字节
-    )
-    try:
-        # 提供 Redis 客户端给调用者使用
-        yield client
-    finally:
-        # 关闭连接
-        client.close()      
-    
+    # Redis 客户端共享同一个连接池, 不需要每次关闭
+    # redis-py resets the pool by itself when it detects a fork
+    client = redis.Redis(connection_pool=_get_redis_pool(db))
+    yield client
+
+@contextmanager
+def redis_pipeline(db: int = 0, transaction: bool = False):
+    """
+    Batch Redis commands into one round trip
+
+    Commands queued on the pipeline are sent when the caller runs
+    pipe.execute(), anything still queued is sent when the block exits.
 
-    
\ No newline at end of file
+    Args:
+        db (int): Redis 数据库编号
+        transaction (bool): wrap the batch in MULTI/EXEC
+    """
+    with redis_connection(db) as client:
+        pipe = client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+            if len(pipe):
+                pipe.execute()
+        finally:
+            pipe.reset()
@@ -0,0 +1,172 @@
+# src\backend\src\utils\indexes.py
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from .db import connect_mongo, connect_mysql
+from .env import Config
+
+# Indexes backing the hot queries of the routes, keyed by collection
+MONGO_INDEXES = {
+    "posts": [
+        # _id breaks ties between posts created in the same millisecond for keyset pagination
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id_desc"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_id_created_at_id"),
+        # the cleanup job checks whether stale direct uploads are attached to a post
+        IndexModel([("media_key", ASCENDING)], name="media_key", sparse=True),
+        # full-text search for get_posts?search=, a title match ranks above a content match
+        IndexModel(
+            [("title", TEXT), ("content", TEXT)],
+            name="title_content_text",
+            weights={"title": 3, "content": 1},
+            default_language=Config.get("MONGO_TEXT_LANGUAGE", "english"),
+        ),
+    ],
+    "comments": [
+        IndexModel([("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="post_id_created_at_id"),
+    ],
+    "media": [
+        IndexModel([("refs", ASCENDING), ("released_at", ASCENDING)], name="refs_released_at"),
+        IndexModel([("state", ASCENDING)], name="state", sparse=True),
+    ],
+    "likes": [
+        IndexModel([("user_id", ASCENDING), ("post_id", ASCENDING)], name="user_post", unique=True),
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timestamp"),
+        IndexModel([("post_id", ASCENDING)], name="post_id"),
+    ],
+    "users": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("history.post_id", ASCENDING)], name="history_post_id"),
+    ],
+}
+
+# (table, index name, columns)
+MYSQL_INDEXES = [
+    ("users", "idx_users_username", ("username",)),
+]
+
+# Queries run on (almost) every request; each must be answered from an index
+HOT_MONGO_QUERIES = [
+    ("posts", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"user_id": 0}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("posts", {"$text": {"$search": "search"}}, None),
+    ("comments", {"post_id": 0}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    ("users", {"user_id": 0}, None),
+    ("users", {"username": ""}, None),
+    ("likes", {"user_id": 0, "post_id": {"$in": [""]}}, None),
+    ("likes", {"user_id": 0}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("users", {"history.post_id": ""}, None),
+]
+
+HOT_MYSQL_QUERIES = [
+    ("SELECT user_id FROM users WHERE username = %s", ("",)),
+]
+
+_required = set()
+
+def require_indexes(db, collection_name):
+    """
+    Create the MONGO_INDEXES of one collection before code that depends on
+    them, e.g. a unique index that detects duplicates
+
+    Runs once per process; unlike the startup bootstrap a failure is raised,
+    so nothing is written without the index.
+    """
+    if collection_name not in _required:
+        db[collection_name].create_indexes(MONGO_INDEXES[collection_name])
+        _required.add(collection_name)
+
+def _plan_stages(plan):
+    """Yield every stage name of an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+def ensure_mongo_indexes(logger=None):
+    """
+    Create the Mongo indexes listed in MONGO_INDEXES
+
+    create_indexes is a no-op for indexes that already exist with the same
+    definition, so this is safe to run on every startup.
+
+    Returns:
+        Dict[str, list]: index names present per collection after the run
+    """
+    logger = logger or logging.getLogger(__name__)
+    present = {}
+    with connect_mongo() as db:
+        for collection_name, indexes in MONGO_INDEXES.items():
+            collection = db[collection_name]
+            created = collection.create_indexes(indexes)
+            logger.debug(f"Ensured indexes {created} on {collection_name}")
+            present[collection_name] = sorted(collection.index_information().keys())
+            missing = {index.document["name"] for index in indexes} - set(present[collection_name])
+            if missing:
+                logger.error(f"Indexes missing on {collection_name} after bootstrap: {sorted(missing)}")
+    return present
+
+def ensure_mysql_indexes(logger=None):
+    """
+    Create the MySQL indexes listed in MYSQL_INDEXES if they do not exist
+
+    Returns:
+        List[str]: names of indexes created by this run
+    """
+    logger = logger or logging.getLogger(__name__)
+    created = []
+    with connect_mysql() as (cursor, connection):
+        for table, name, columns in MYSQL_INDEXES:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                (table, name),
+            )
+            if cursor.fetchone()[0]:
+                continue
+            logger.info(f"Creating MySQL index {name} on {table}({', '.join(columns)})")
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+            created.append(name)
+    return created
+
+def find_collection_scans(logger=None):
+    """
+    Explain the hot queries and report those that fall back to a full scan
+
+    Returns:
+        List[str]: description of every hot query that scans the whole collection/table
+    """
+    logger = logger or logging.getLogger(__name__)
+    scans = []
+    with connect_mongo() as db:
+        for collection_name, query, sort in HOT_MONGO_QUERIES:
+            cursor = db[collection_name].find(query).limit(10)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain().get("queryPlanner", {})
+            if "COLLSCAN" in _plan_stages(plan.get("winningPlan", {})):
+                scans.append(f"mongo {collection_name} {query} sort={sort}")
+
+    with connect_mysql() as (cursor, connection):
+        for sql, params in HOT_MYSQL_QUERIES:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            columns = [column[0] for column in cursor.description]
+            for row in cursor.fetchall():
+                if dict(zip(columns, row)).get("type") == "ALL":
+                    scans.append(f"mysql {sql}")
+
+    for scan in scans:
+        logger.warning(f"Hot query falls back to a full scan: {scan}")
+    return scans
+
+def bootstrap_indexes(logger=None):
+    """Create all required indexes, then verify the hot queries use them"""
+    logger = logger or logging.getLogger(__name__)
+    mongo = ensure_mongo_indexes(logger)
+    mysql = ensure_mysql_indexes(logger)
+    scans = find_collection_scans(logger)
+    logger.info(f"Index bootstrap finished: mongo={mongo} mysql_created={mysql} full_scans={len(scans)}")
+    return {"mongo": mongo, "mysql_created": mysql, "full_scans": scans}
@@ -0,0 +1,71 @@
+# src\backend\src\utils\leaderboard.py
+from datetime import datetime, timedelta, timezone
+from .db import redis_connection
+from .env import Config
+
+# Reads per post in time buckets, one sorted set per UTC hour and per UTC day.
+# Top-N queries only touch the few buckets of their window, never the whole keyspace.
+LEADERBOARD_DB = 1
+_HOUR_PREFIX = "reads:hour:"
+_DAY_PREFIX = "reads:day:"
+_HOUR_KEY = "reads:top:hour"
+_WEEK_KEY = "reads:top:week"
+_HOUR_TTL = 3 * 60 * 60
+_DAY_TTL = 8 * 24 * 60 * 60
+
+WINDOWS = ("hour", "today", "week")
+
+def _hour_key(moment):
+    return _HOUR_PREFIX + moment.strftime("%Y%m%d%H")
+
+def _day_key(moment):
+    return _DAY_PREFIX + moment.strftime("%Y%m%d")
+
+def record_read(pipe, post_id, now=None):
+    """Count one read of a post; queued on the caller's pipeline"""
+    now = now or datetime.now(timezone.utc)
+    for key, ttl in ((_hour_key(now), _HOUR_TTL), (_day_key(now), _DAY_TTL)):
+        pipe.zincrby(key, 1, str(post_id))
+        pipe.expire(key, ttl, nx=True)
+
+def bucket_keys(now=None):
+    """Every bucket and cached union that can still hold reads"""
+    now = now or datetime.now(timezone.utc)
+    hours = [_hour_key(now - timedelta(hours=i)) for i in range(_HOUR_TTL // 3600)]
+    days = [_day_key(now - timedelta(days=i)) for i in range(_DAY_TTL // 86400)]
+    return hours + days + [_HOUR_KEY, _WEEK_KEY]
+
+def top_posts(window="today", count=10, now=None):
+    """
+    Most read posts of a time window
+
+    "hour" is a sliding last 60 minutes: the current hour bucket plus the
+    part of the previous one still inside the window. "today" is the current
+    UTC day, "week" the last 7 UTC days. The hour and week unions are kept for
+    LEADERBOARD_HOUR_TTL / LEADERBOARD_WEEK_TTL seconds so they are not
+    rebuilt on every request.
+
+    Returns:
+        List[Tuple[str, int]]: (post_id, reads), most read first
+    """
+    now = now or datetime.now(timezone.utc)
+    with redis_connection(LEADERBOARD_DB) as redis_client:
+        with redis_client.pipeline(transaction=False) as pipe:
+            if window in ("hour", "week"):
+                key = _HOUR_KEY if window == "hour" else _WEEK_KEY
+                pipe.exists(key)
+                pipe.zrevrange(key, 0, count - 1, withscores=True)
+                exists, ranking = pipe.execute()
+                if not exists:
+                    if window == "hour":
+                        elapsed = (now.minute * 60 + now.second) / 3600
+                        pipe.zunionstore(key, {_hour_key(now): 1, _hour_key(now - timedelta(hours=1)): 1 - elapsed})
+                        pipe.expire(key, int(Config.get("LEADERBOARD_HOUR_TTL", 60)))
+                    else:
+                        pipe.zunionstore(key, [_day_key(now - timedelta(days=i)) for i in range(7)])
+                        pipe.expire(key, int(Config.get("LEADERBOARD_WEEK_TTL", 300)))
+                    pipe.zrevrange(key, 0, count - 1, withscores=True)
+                    ranking = pipe.execute()[-1]
+            else:
+                ranking = redis_client.zrevrange(_day_key(now), 0, count - 1, withscores=True)
+    return [(post_id, round(score)) for post_id, score in ranking]
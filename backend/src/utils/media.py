@@ -0,0 +1,227 @@
+# src\backend\src\utils\media.py
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from minio.commonconfig import CopySource
+from minio.error import S3Error
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from werkzeug.utils import secure_filename
+from .db import connect_mongo, connect_Minio, get_minio_signer, redis_connection
+from .env import Config
+
+# Uploads that were handed a presigned URL but not attached to a post yet
+UPLOAD_DB = 1
+_UPLOAD_PREFIX = "upload:"
+
+# Stored media is named after the sha256 of its content, so identical files are kept once.
+# The media collection counts the posts referencing each object: {_id: key, refs, stored, size}
+MEDIA_PREFIX = "media/"
+TEMP_PREFIX = "uploads/"
+_CHUNK_SIZE = 1024 * 1024
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+class UploadError(Exception):
+    """A direct upload that cannot be attached; carries the HTTP status to answer with"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def _expiry():
+    return int(Config.get("UPLOAD_URL_EXPIRY", 900))
+
+def _extension(filename):
+    # kept on every object name so the frontend can tell videos from images
+    return os.path.splitext(secure_filename(filename or ""))[1].lower()
+
+def new_object_name(user_id, filename):
+    """Collision-free name for a direct upload until its content hash is known"""
+    return f"{TEMP_PREFIX}{user_id}/{uuid.uuid4().hex}{_extension(filename)}"
+
+def content_key(digest, filename):
+    return f"{MEDIA_PREFIX}{digest}{_extension(filename)}"
+
+def hash_stream(stream):
+    """sha256 and size of a stream, read in chunks so large files never sit in memory"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def acquire_media(db, key):
+    """
+    Take a reference on a content-addressed object
+
+    An object marked "deleting" by the cleanup job is never handed out again;
+    the upsert then collides on _id and is retried until the cleanup is done.
+
+    Returns:
+        bool: True when the object is not stored yet and the caller must upload it
+    """
+    for _ in range(int(Config.get("MEDIA_ACQUIRE_RETRIES", 20))):
+        try:
+            before = db["media"].find_one_and_update(
+                {"_id": key, "state": {"$ne": "deleting"}},
+                {
+                    "$inc": {"refs": 1},
+                    "$unset": {"released_at": ""},
+                    "$setOnInsert": {"stored": False, "created_at": datetime.now(timezone.utc)},
+                },
+                upsert=True,
+            )
+            return not (before and before.get("stored"))
+        except DuplicateKeyError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Media {key} is still being deleted")
+
+def mark_stored(db, key, size):
+    db["media"].update_one({"_id": key}, {"$set": {"stored": True, "size": size}})
+
+def release_media(db, key):
+    """Drop a post's reference; unreferenced objects are removed later by the cleanup job"""
+    if not key or not key.startswith(MEDIA_PREFIX):
+        return
+    media = db["media"].find_one_and_update(
+        {"_id": key, "refs": {"$gt": 0}}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if media and media["refs"] <= 0:
+        db["media"].update_one({"_id": key, "refs": 0}, {"$set": {"released_at": datetime.now(timezone.utc)}})
+
+def store_media(minio_client, bucket_name, stream, filename, content_type=None):
+    """
+    Store an uploaded file under its content hash, skipping the upload when
+    the same content is already stored, and take a reference on it
+
+    Returns:
+        str: object name of the stored media
+    """
+    stream.seek(0)
+    digest, size = hash_stream(stream)
+    key = content_key(digest, filename)
+    with connect_mongo() as db:
+        if acquire_media(db, key):
+            stream.seek(0)
+            try:
+                minio_client.put_object(
+                    bucket_name, key, stream, length=size,
+                    content_type=content_type or "application/octet-stream",
+                )
+            except Exception:
+                release_media(db, key)
+                raise
+            mark_stored(db, key, size)
+    return key
+
+def adopt_upload(temp_name):
+    """
+    Move a direct upload to its content-addressed name
+
+    The bytes are hashed as they stream from MinIO and copied server-side, so
+    this runs on the media workers rather than in a request. When the content
+    is already stored, the duplicate is just deleted.
+
+    Returns:
+        str: object name of the stored media (a reference is taken on it)
+    """
+    with connect_Minio() as (minio_client, bucket_name, url):
+        response = minio_client.get_object(bucket_name, temp_name)
+        try:
+            digest, size = hash_stream(response)
+        finally:
+            response.close()
+            response.release_conn()
+        key = content_key(digest, temp_name)
+        with connect_mongo() as db:
+            if acquire_media(db, key):
+                minio_client.copy_object(bucket_name, key, CopySource(bucket_name, temp_name))
+                mark_stored(db, key, size)
+        minio_client.remove_object(bucket_name, temp_name)
+    return key
+
+def start_upload(user_id, filename, content_type=None, sha256=None):
+    """
+    Hand out a presigned PUT URL the browser uploads the file to directly
+
+    When the client sends the sha256 of a file that is already stored, no URL
+    is handed out: the upload can be completed right away without sending
+    any bytes.
+
+    Returns:
+        dict: upload_id, exists, and unless it exists: url to PUT the file to,
+            object_name, expires_in (seconds)
+    """
+    upload_id = uuid.uuid4().hex
+    if sha256 and _SHA256.match(sha256.lower()):
+        key = content_key(sha256.lower(), filename)
+        with connect_mongo() as db:
+            existing = db["media"].find_one({"_id": key, "stored": True, "state": {"$ne": "deleting"}}, {"_id": 1})
+        if existing:
+            _remember_upload(upload_id, {"user_id": user_id, "object_name": key, "existing": True})
+            return {"upload_id": upload_id, "exists": True}
+
+    object_name = new_object_name(user_id, filename)
+    url = get_minio_signer().presigned_put_object(
+        Config.get("MINIO_BUCKET"), object_name, expires=timedelta(seconds=_expiry())
+    )
+    _remember_upload(upload_id, {"user_id": user_id, "object_name": object_name, "content_type": content_type})
+    return {"upload_id": upload_id, "exists": False, "url": url, "object_name": object_name, "expires_in": _expiry()}
+
+def _remember_upload(upload_id, pending):
+    with redis_connection(UPLOAD_DB) as redis_client:
+        # a PUT started just before the URL expires may still finish
+        redis_client.set(_UPLOAD_PREFIX + upload_id, json.dumps(pending), ex=_expiry() + 60)
+
+def finish_upload(user_id, upload_id):
+    """
+    Check that a direct upload arrived in MinIO and may be attached to a post
+
+    A direct upload keeps its temporary name until the media workers adopt it
+    under its content hash; an already stored file gets a reference right away.
+
+    Returns:
+        tuple: (object_name, media_url)
+
+    Raises:
+        UploadError: unknown or foreign upload, object missing or too large
+    """
+    with redis_connection(UPLOAD_DB) as redis_client:
+        pending = redis_client.get(_UPLOAD_PREFIX + upload_id)
+    if pending is None:
+        raise UploadError("Upload not found or expired", 404)
+    pending = json.loads(pending)
+    if pending["user_id"] != user_id:
+        raise UploadError("Unauthorized", 403)
+    object_name = pending["object_name"]
+    if pending.get("existing"):
+        with connect_mongo() as db:
+            if acquire_media(db, object_name):
+                # removed since init; the client has to upload after all
+                release_media(db, object_name)
+                discard_upload(upload_id)
+                raise UploadError("Upload has not been received", 409)
+        with connect_Minio() as (minio_client, bucket_name, url):
+            return object_name, f"{url}/{object_name}"
+    with connect_Minio() as (minio_client, bucket_name, url):
+        try:
+            stat = minio_client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchObject"):
+                raise
+            raise UploadError("Upload has not been received", 409)
+        if stat.size > int(Config.get("MEDIA_MAX_BYTES", 100 * 1024 * 1024)):
+            minio_client.remove_object(bucket_name, object_name)
+            discard_upload(upload_id)
+            raise UploadError("Media file too large", 413)
+        return object_name, f"{url}/{object_name}"
+
+def discard_upload(upload_id):
+    """Forget a pending upload once it is attached (or rejected)"""
+    with redis_connection(UPLOAD_DB) as redis_client:
+        redis_client.delete(_UPLOAD_PREFIX + upload_id)
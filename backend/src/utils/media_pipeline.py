@@ -0,0 +1,187 @@
+# src\backend\src\utils\media_pipeline.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+from .cache import invalidate, post_tag
+from .db import connect_mongo, connect_Minio
+from .env import Config
+from .media import MEDIA_PREFIX, TEMP_PREFIX, adopt_upload, release_media
+
+# Downscaled copies of uploaded images (longest side in px), so feeds do not pull full-resolution originals
+VARIANTS = {
+    "thumb": int(Config.get("MEDIA_THUMB_SIZE", 320)),
+    "medium": int(Config.get("MEDIA_MEDIUM_SIZE", 1080)),
+}
+_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Process-wide worker pool for media jobs, created on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(Config.get("MEDIA_WORKERS", 2)), thread_name_prefix="media"
+                )
+    return _executor
+
+def _reset_after_fork():
+    # worker threads do not survive a fork, the child starts its own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def needs_variants(object_name):
+    """Only images get variants, videos are served as uploaded"""
+    return os.path.splitext(object_name)[1].lower() in _IMAGE_EXTENSIONS
+
+def variant_name(object_name, variant):
+    return f"variants/{os.path.splitext(object_name)[0]}_{variant}.jpg"
+
+def media_update(object_name, media_url):
+    """Mongo update that points a post at new media and drops the variants of the old one"""
+    update = {"$set": {"media_url": media_url, "media_key": object_name}, "$unset": {"media_variants": ""}}
+    if needs_variants(object_name):
+        update["$set"]["media_status"] = "processing"
+    else:
+        update["$unset"]["media_status"] = ""
+    return update
+
+def _render(image, size):
+    variant = image.copy()
+    variant.thumbnail((size, size))
+    if variant.mode not in ("RGB", "L"):
+        variant = variant.convert("RGB")
+    buffer = BytesIO()
+    variant.save(buffer, "JPEG", quality=int(Config.get("MEDIA_VARIANT_QUALITY", 80)), optimize=True)
+    buffer.seek(0)
+    return buffer
+
+def process_media(post_id, object_name, media_url):
+    """
+    Build the variants of a post's media, upload them and record them on the post
+
+    The post is only updated while its media_url is still the one the job was
+    started for, so a job for replaced media cannot overwrite newer variants.
+
+    Returns:
+        Dict[str, str]: variant name -> URL
+    """
+    with connect_mongo() as db:
+        # stored media is shared between posts, its variants are only built once
+        media = db["media"].find_one({"_id": object_name}, {"variants": 1}) if object_name.startswith(MEDIA_PREFIX) else None
+    variants = (media or {}).get("variants")
+
+    if not variants:
+        with connect_Minio() as (minio_client, bucket_name, url):
+            response = minio_client.get_object(bucket_name, object_name)
+            try:
+                data = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+            variants = {}
+            with Image.open(BytesIO(data)) as image:
+                image = ImageOps.exif_transpose(image)  # phone photos are stored sideways with a rotation tag
+                for name, size in VARIANTS.items():
+                    buffer = _render(image, size)
+                    key = variant_name(object_name, name)
+                    minio_client.put_object(
+                        bucket_name, key, buffer, length=buffer.getbuffer().nbytes, content_type="image/jpeg"
+                    )
+                    variants[name] = f"{url}/{key}"
+        if media:
+            with connect_mongo() as db:
+                db["media"].update_one({"_id": object_name}, {"$set": {"variants": variants}})
+
+    with connect_mongo() as db:
+        result = db["posts"].update_one(
+            {"_id": post_id, "media_url": media_url},
+            {"$set": {"media_variants": variants, "media_status": "ready"}},
+        )
+    if result.matched_count:
+        invalidate(post_tag(post_id))
+    return variants
+
+def _adopt(post_id, temp_name):
+    """
+    Give a post's direct upload its content-addressed name
+
+    Returns:
+        tuple: (object name, media URL), or None when the post moved on meanwhile
+    """
+    key = adopt_upload(temp_name)
+    with connect_Minio() as (minio_client, bucket_name, url):
+        media_url = f"{url}/{key}"
+    with connect_mongo() as db:
+        result = db["posts"].update_one(
+            {"_id": post_id, "media_key": temp_name},
+            {"$set": {"media_key": key, "media_url": media_url}},
+        )
+        if not result.matched_count:
+            release_media(db, key)
+            return None
+    invalidate(post_tag(post_id))
+    return key, media_url
+
+def _run(post_id, object_name, media_url):
+    try:
+        if object_name.startswith(TEMP_PREFIX):
+            adopted = _adopt(post_id, object_name)
+            if adopted is None or not needs_variants(object_name):
+                return
+            object_name, media_url = adopted
+        variants = process_media(post_id, object_name, media_url)
+        logger.info(f"Media variants ready for post {post_id}: {sorted(variants)}")
+    except Exception as e:
+        logger.error(f"Media processing failed for post {post_id} ({object_name}): {e}")
+        try:
+            with connect_mongo() as db:
+                db["posts"].update_one({"_id": post_id, "media_url": media_url}, {"$set": {"media_status": "failed"}})
+            invalidate(post_tag(post_id))
+        except Exception as e:
+            logger.error(f"Could not mark media of post {post_id} as failed: {e}")
+
+def schedule_media(post_id, object_name, media_url):
+    """Queue hashing of a direct upload and variant generation for a post's new media; returns right away"""
+    if object_name.startswith(TEMP_PREFIX) or needs_variants(object_name):
+        _get_executor().submit(_run, post_id, object_name, media_url)
+
+def process_pending_media(logger=None):
+    """
+    Build variants for every post whose image has none yet, e.g. posts from
+    before the pipeline existed or jobs lost to a restart
+
+    Returns:
+        Dict[str, int]: number of posts processed and failed
+    """
+    logger = logger or logging.getLogger(__name__)
+    processed = failed = 0
+    bucket_name = Config.get("MINIO_BUCKET")
+    with connect_mongo() as db:
+        posts = list(db["posts"].find(
+            {"media_url": {"$nin": ["", None]}, "media_variants": {"$exists": False}}, {"media_url": 1}
+        ))
+    for post in posts:
+        object_name = post["media_url"].split(f"/{bucket_name}/", 1)[-1]
+        if not needs_variants(object_name):
+            continue
+        try:
+            process_media(post["_id"], object_name, post["media_url"])
+            processed += 1
+        except Exception as e:
+            failed += 1
+            logger.error(f"Media processing failed for post {post['_id']} ({object_name}): {e}")
+    logger.info(f"Media processing finished: {processed} posts processed, {failed} failed")
+    return {"processed": processed, "failed": failed}
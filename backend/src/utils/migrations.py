@@ -0,0 +1,115 @@
+# src\backend\src\utils\migrations.py
+import logging
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from .db import connect_mongo
+from .indexes import require_indexes
+
+def migrate_post_comments(db, post_id):
+    """
+    Move the embedded comments of one post into the comments collection
+
+    The comments array is unset atomically first, so concurrent calls for
+    the same post never copy a comment twice.
+
+    Returns:
+        int: number of comments moved
+    """
+    post = db["posts"].find_one_and_update(
+        {"_id": post_id, "comments": {"$exists": True}},
+        {"$unset": {"comments": ""}},
+        projection={"comments": 1},
+    )
+    if not post or not post.get("comments"):
+        return 0
+    documents = [{
+        "post_id": post_id,
+        "user_id": comment.get("user_id"),
+        "comment": comment.get("comment"),
+        "created_at": comment.get("created_at") or datetime.now(timezone.utc),
+    } for comment in post["comments"]]
+    try:
+        db["comments"].insert_many(documents, ordered=True)
+    except Exception:
+        # put the comments back so nothing is lost, the next run retries
+        db["posts"].update_one({"_id": post_id}, {"$push": {"comments": {"$each": post["comments"]}}})
+        raise
+    return len(documents)
+
+def migrate_embedded_comments(logger=None):
+    """
+    Move every embedded posts.comments array into the comments collection
+
+    Safe to run repeatedly and while the backend is serving traffic.
+
+    Returns:
+        Dict[str, int]: number of posts and comments migrated
+    """
+    logger = logger or logging.getLogger(__name__)
+    posts = comments = 0
+    with connect_mongo() as db:
+        for post in db["posts"].find({"comments": {"$exists": True}}, {"_id": 1}):
+            moved = migrate_post_comments(db, post["_id"])
+            posts += 1
+            comments += moved
+            if moved:
+                logger.debug(f"Moved {moved} comments of post {post['_id']}")
+    logger.info(f"Comment migration finished: {comments} comments from {posts} posts")
+    return {"posts": posts, "comments": comments}
+
+def migrate_user_likes(db, user_id):
+    """
+    Move the embedded likes array of one user into the likes collection
+
+    Like migrate_post_comments the array is unset first. Likes that already
+    have an edge (liked again meanwhile) are skipped by the unique index.
+
+    Returns:
+        int: number of likes moved
+    """
+    user = db["users"].find_one_and_update(
+        {"user_id": user_id, "likes": {"$exists": True}},
+        {"$unset": {"likes": ""}},
+        projection={"likes": 1},
+    )
+    if not user or not user.get("likes"):
+        return 0
+    documents = [{
+        "user_id": user_id,
+        "post_id": str(like.get("post_id")),
+        "timestamp": like.get("timestamp") or datetime.now(timezone.utc),
+    } for like in user["likes"] if like.get("post_id")]
+    try:
+        require_indexes(db, "likes")  # duplicates are only skipped with the unique index in place
+        result = db["likes"].insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            db["users"].update_one({"user_id": user_id}, {"$push": {"likes": {"$each": user["likes"]}}})
+            raise
+        return e.details.get("nInserted", 0)
+    except Exception:
+        # put the likes back so nothing is lost, the next run retries
+        db["users"].update_one({"user_id": user_id}, {"$push": {"likes": {"$each": user["likes"]}}})
+        raise
+
+def migrate_embedded_likes(logger=None):
+    """
+    Move every embedded users.likes array into the likes collection
+
+    Safe to run repeatedly and while the backend is serving traffic.
+
+    Returns:
+        Dict[str, int]: number of users and likes migrated
+    """
+    logger = logger or logging.getLogger(__name__)
+    users = likes = 0
+    with connect_mongo() as db:
+        for user in db["users"].find({"likes": {"$exists": True}}, {"user_id": 1}):
+            moved = migrate_user_likes(db, user["user_id"])
+            users += 1
+            likes += moved
+            if moved:
+                logger.debug(f"Moved {moved} likes of user {user['user_id']}")
+    logger.info(f"Like migration finished: {likes} likes from {users} users")
+    return {"users": users, "likes": likes}
@@ -0,0 +1,30 @@
+# src\backend\src\utils\pagination.py
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+
+# Keyset pagination on (<time field>, _id): pages are found by index, however deep
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_cursor(doc, field="created_at"):
+    """Opaque keyset cursor pointing just after the given document"""
+    moment = doc[field]
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)  # pymongo returns naive UTC datetimes
+    position = {"t": (moment - _EPOCH) // timedelta(milliseconds=1), "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor, descending=True, field="created_at"):
+    """Turn a cursor from encode_cursor back into a query on (field, _id)"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        moment = _EPOCH + timedelta(milliseconds=int(position["t"]))
+        doc_id = ObjectId(position["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: moment}},
+        {field: moment, "_id": {op: doc_id}},
+    ]}
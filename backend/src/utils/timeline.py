@@ -0,0 +1,84 @@
+# src\backend\src\utils\timeline.py
+import logging
+from datetime import timezone
+from .db import connect_mongo, redis_connection, redis_pipeline
+from .env import Config
+
+# The newest posts, newest first, as a sorted set of post ids scored by created_at (ms).
+# Posts with the same score are ordered by id, which matches Mongo's (created_at, _id) sort.
+TIMELINE_DB = 1
+TIMELINE_KEY = "posts:timeline"
+_READY_KEY = "posts:timeline:ready"
+_REBUILD_LOCK = "posts:timeline:rebuild"
+
+logger = logging.getLogger(__name__)
+
+def _size():
+    return int(Config.get("TIMELINE_SIZE", 1000))
+
+def _score(created_at):
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)  # pymongo returns naive UTC datetimes
+    return int(created_at.timestamp() * 1000)
+
+def timeline_add(post_id, created_at):
+    """Put a new post on top of the timeline and drop what falls out of the window"""
+    try:
+        with redis_pipeline(TIMELINE_DB) as pipe:
+            pipe.zadd(TIMELINE_KEY, {str(post_id): _score(created_at)})
+            pipe.zremrangebyrank(TIMELINE_KEY, 0, -_size() - 1)
+    except Exception as e:
+        logger.warning(f"Timeline add failed for post {post_id}: {e}")
+
+def timeline_remove(post_id):
+    """Take a deleted post off the timeline"""
+    try:
+        with redis_connection(TIMELINE_DB) as redis_client:
+            redis_client.zrem(TIMELINE_KEY, str(post_id))
+    except Exception as e:
+        logger.warning(f"Timeline remove failed for post {post_id}: {e}")
+
+def rebuild_timeline():
+    """Load the newest TIMELINE_SIZE posts from Mongo; only one worker does it at a time"""
+    with redis_connection(TIMELINE_DB) as redis_client:
+        if not redis_client.set(_REBUILD_LOCK, 1, nx=True, ex=30):
+            return False
+        try:
+            with connect_mongo() as db:
+                posts = db["posts"].find({}, {"created_at": 1}).sort([("created_at", -1), ("_id", -1)]).limit(_size())
+                scores = {str(post["_id"]): _score(post["created_at"]) for post in posts}
+            # merge instead of replace, so posts created while loading are kept
+            with redis_pipeline(TIMELINE_DB) as pipe:
+                if scores:
+                    pipe.zadd(TIMELINE_KEY, scores)
+                    pipe.zremrangebyrank(TIMELINE_KEY, 0, -_size() - 1)
+                pipe.set(_READY_KEY, 1)
+            logger.info(f"Timeline rebuilt with {len(scores)} posts")
+            return True
+        finally:
+            redis_client.delete(_REBUILD_LOCK)
+
+def timeline_page(offset, count):
+    """
+    Read post ids for the newest-first feed from the timeline
+
+    Returns:
+        list: post ids in feed order, or None when the range is not (fully)
+            inside the cached window and Mongo has to answer instead
+    """
+    try:
+        with redis_connection(TIMELINE_DB) as redis_client:
+            with redis_client.pipeline(transaction=False) as pipe:
+                pipe.exists(_READY_KEY)
+                pipe.zcard(TIMELINE_KEY)
+                pipe.zrevrange(TIMELINE_KEY, offset, offset + count - 1)
+                exists, size, post_ids = pipe.execute()
+        if not exists:
+            rebuild_timeline()
+            return None
+        if offset + count > size:
+            return None
+        return post_ids
+    except Exception as e:
+        logger.warning(f"Timeline read failed: {e}")
+        return None
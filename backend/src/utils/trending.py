@@ -0,0 +1,86 @@
+# src\backend\src\utils\trending.py
+import logging
+import math
+import time
+from .db import redis_connection
+from .env import Config
+
+# Exponentially decayed engagement per post in one sorted set.
+# Scores are stored relative to a reference time (the epoch key): an event at time t
+# adds weight * e^(rate * (t - epoch)), so older events weigh less without ever
+# rewriting existing scores. Once a half-life has passed the epoch moves forward and
+# the whole set is rescaled with a single ZUNIONSTORE, which also drops dead entries.
+TRENDING_DB = 1
+TRENDING_KEY = "trending:scores"
+_EPOCH_KEY = "trending:epoch"
+
+WEIGHTS = {
+    "read": float(Config.get("TRENDING_WEIGHT_READ", 1)),
+    "like": float(Config.get("TRENDING_WEIGHT_LIKE", 3)),
+    "comment": float(Config.get("TRENDING_WEIGHT_COMMENT", 5)),
+}
+
+# Runs atomically in Redis, so an increment never mixes with a concurrent rescale
+_RECORD = """
+local now = tonumber(ARGV[3])
+local rate = tonumber(ARGV[4])
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[2], now)
+elseif now - epoch > tonumber(ARGV[5]) then
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', tostring(math.exp(-rate * (now - epoch))))
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[7])
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[6]) - 1)
+    epoch = now
+    redis.call('SET', KEYS[2], now)
+end
+return redis.call('ZINCRBY', KEYS[1], tostring(tonumber(ARGV[2]) * math.exp(rate * (now - epoch))), ARGV[1])
+"""
+
+logger = logging.getLogger(__name__)
+
+def _half_life():
+    return float(Config.get("TRENDING_HALF_LIFE", 24 * 60 * 60))
+
+def _rate():
+    return math.log(2) / _half_life()
+
+def record_event(post_id, event, count=1):
+    """
+    Add an engagement event ("read", "like", "comment") to a post's trending score
+
+    A negative count takes an event back, e.g. a removed like. Best effort:
+    the script runs on its own connection, so a failure (e.g. a Redis
+    without scripting) is logged and never reaches the caller's request.
+    """
+    args = [
+        str(post_id), WEIGHTS[event] * count, time.time(), _rate(), _half_life(),
+        int(Config.get("TRENDING_SIZE", 10000)), float(Config.get("TRENDING_MIN_SCORE", 0.01)),
+    ]
+    try:
+        with redis_connection(TRENDING_DB) as redis_client:
+            redis_client.register_script(_RECORD)(keys=[TRENDING_KEY, _EPOCH_KEY], args=args)
+    except Exception as e:
+        logger.warning(f"Trending update failed for post {post_id}: {e}")
+
+def trending_posts(count=10):
+    """
+    Highest decayed scores, as of now
+
+    Returns:
+        List[Tuple[str, float]]: (post_id, score), hottest first
+    """
+    with redis_connection(TRENDING_DB) as redis_client:
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(_EPOCH_KEY)
+            pipe.zrevrange(TRENDING_KEY, 0, count - 1, withscores=True)
+            epoch, ranking = pipe.execute()
+    if epoch is None:
+        return []
+    decay = math.exp(-_rate() * (time.time() - float(epoch)))
+    return [(post_id, round(score * decay, 3)) for post_id, score in ranking if score > 0]
+
+def remove_posts(pipe, post_ids):
+    """Queue removal of deleted posts on the caller's pipeline"""
+    pipe.zrem(TRENDING_KEY, *post_ids)
@@ -0,0 +1,31 @@
+import fakeredis
+import mongomock
+import mongomock.collection
+import pytest
+import redis
+
+from utils import db
+
+# pymongo 4.9+ passes sort= to the bulk builder, which mongomock does not accept yet
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+mongomock.collection.BulkOperationBuilder.add_update = (
+    lambda self, *args, sort=None, **kwargs: _add_update(self, *args, **kwargs)
+)
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    """In-memory Redis and Mongo behind the utils.db helpers; yields (redis client for db 1, mongo db)"""
+    server = fakeredis.FakeServer()
+    pools = {}
+
+    def pool(number):
+        if number not in pools:
+            pools[number] = fakeredis.FakeRedis(server=server, db=number, decode_responses=True).connection_pool
+        return pools[number]
+
+    mongo_client = mongomock.MongoClient()
+    monkeypatch.setattr(db, "_get_redis_pool", pool)
+    monkeypatch.setattr(db, "get_mongo_client", lambda: mongo_client)
+    monkeypatch.setenv("MONGO_DATABASE", "test")
+    yield redis.Redis(connection_pool=pool(1)), mongo_client["test"]
@@ -0,0 +1,182 @@
+import time
+
+import mongomock.collection
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from utils import counters
+
+
+def make_post(mongo, read_count=0, like_count=0):
+    post_id = mongo["posts"].insert_one({"title": "t", "read_count": read_count, "like_count": like_count}).inserted_id
+    return str(post_id)
+
+
+def counts(mongo, post_id):
+    post = mongo["posts"].find_one({"_id": ObjectId(post_id)})
+    return post["read_count"], post["like_count"]
+
+
+def test_increment_buffers_without_touching_the_post(stores):
+    redis_client, mongo = stores
+    post_id = make_post(mongo)
+
+    for _ in range(3):
+        counters.increment(post_id, "read_count")
+    counters.increment(post_id, "like_count")
+    counters.increment(post_id, "like_count", -1)
+    counters.increment(post_id, "like_count")
+
+    assert counts(mongo, post_id) == (0, 0)
+    assert redis_client.hgetall(counters._PENDING_KEY) == {f"{post_id}:read_count": "3", f"{post_id}:like_count": "1"}
+
+
+def test_flush_writes_the_deltas_and_clears_the_batch(stores):
+    redis_client, mongo = stores
+    first, second = make_post(mongo, read_count=5), make_post(mongo)
+    counters.increment(first, "read_count", 2)
+    counters.increment(second, "like_count")
+
+    assert counters.flush_counters() == 2
+    assert counts(mongo, first) == (7, 0)
+    assert counts(mongo, second) == (0, 1)
+    for key in (counters._PENDING_KEY, counters._FLUSHING_KEY, counters._SINCE_KEY, counters._LOCK_KEY):
+        assert not redis_client.exists(key)
+    assert counters.flush_counters() == 0
+
+
+def test_flush_skips_deltas_that_cancel_out(stores):
+    _, mongo = stores
+    post_id = make_post(mongo, like_count=1)
+    counters.increment(post_id, "like_count")
+    counters.increment(post_id, "like_count", -1)
+
+    assert counters.flush_counters() == 0
+    assert counts(mongo, post_id) == (0, 1)
+
+
+def test_flush_does_not_create_missing_posts(stores):
+    _, mongo = stores
+    counters.increment(str(ObjectId()), "like_count")
+
+    assert counters.flush_counters() == 1
+    assert mongo["posts"].count_documents({}) == 0
+
+
+def test_only_one_flush_runs_at_a_time(stores):
+    redis_client, mongo = stores
+    post_id = make_post(mongo)
+    counters.increment(post_id, "read_count")
+    redis_client.set(counters._LOCK_KEY, 1)
+
+    assert counters.flush_counters() is None
+    assert counts(mongo, post_id) == (0, 0)
+
+
+def test_failed_operations_go_back_to_the_queue(stores, monkeypatch):
+    redis_client, mongo = stores
+    good, bad = make_post(mongo), make_post(mongo)
+    counters.increment(good, "read_count", 2)
+    counters.increment(bad, "read_count", 3)
+    counters.increment(bad, "like_count")
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def partly_failing(self, requests, ordered=True, **kwargs):
+        # apply everything except the operation for `bad`, like an unordered bulk with one write error
+        index = next(i for i, request in enumerate(requests) if str(request._filter["_id"]) == bad)
+        bulk_write(self, [r for i, r in enumerate(requests) if i != index], ordered=ordered)
+        raise BulkWriteError({"writeErrors": [{"index": index, "code": 2, "errmsg": "failed"}], "nModified": len(requests) - 1})
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", partly_failing)
+    assert counters.flush_counters() == 1
+    assert counts(mongo, good) == (2, 0)
+    assert counts(mongo, bad) == (0, 0)
+    assert not redis_client.exists(counters._FLUSHING_KEY)
+    assert redis_client.hgetall(counters._PENDING_KEY) == {f"{bad}:read_count": "3", f"{bad}:like_count": "1"}
+    assert redis_client.exists(counters._SINCE_KEY)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    assert counters.flush_counters() == 1
+    assert counts(mongo, bad) == (3, 1)
+    assert counts(mongo, good) == (2, 0)
+
+
+def test_interrupted_flush_is_retried_before_new_deltas(stores, monkeypatch):
+    redis_client, mongo = stores
+    post_id = make_post(mongo)
+    counters.increment(post_id, "read_count", 2)
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def unreachable(self, requests, **kwargs):
+        raise ConnectionFailure("mongo is down")
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", unreachable)
+    with pytest.raises(ConnectionFailure):
+        counters.flush_counters()
+    assert redis_client.hgetall(counters._FLUSHING_KEY) == {f"{post_id}:read_count": "2"}
+    assert not redis_client.exists(counters._LOCK_KEY)
+
+    counters.increment(post_id, "read_count")
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    assert counters.flush_counters() == 1
+    assert counts(mongo, post_id) == (2, 0)
+    assert counters.flush_counters() == 1
+    assert counts(mongo, post_id) == (3, 0)
+
+
+def test_merge_pending_adds_pending_and_flushing_deltas(stores):
+    redis_client, mongo = stores
+    post_id = make_post(mongo)
+    redis_client.hset(counters._PENDING_KEY, mapping={f"{post_id}:read_count": 2, f"{post_id}:like_count": -1})
+    redis_client.hset(counters._FLUSHING_KEY, mapping={f"{post_id}:read_count": 3})
+
+    posts = [
+        {"_id": post_id, "read_count": 10, "like_count": 4},
+        {"_id": post_id, "title": "no counters projected"},
+        None,
+        {"_id": str(ObjectId()), "read_count": None, "like_count": 0},
+    ]
+    assert counters.merge_pending(posts) is posts
+    assert posts[0] == {"_id": post_id, "read_count": 15, "like_count": 3}
+    assert posts[1] == {"_id": post_id, "title": "no counters projected"}
+    assert posts[3]["read_count"] == 0 and posts[3]["like_count"] == 0
+
+
+def test_merged_counts_stay_right_across_a_flush(stores):
+    _, mongo = stores
+    post_id = make_post(mongo)
+    counters.increment(post_id, "read_count", 4)
+
+    def live():
+        post = mongo["posts"].find_one({"_id": ObjectId(post_id)})
+        return counters.merge_pending([dict(post, _id=post_id)])[0]["read_count"]
+
+    assert live() == 4
+    counters.flush_counters()
+    assert live() == 4
+
+
+def test_stale_deltas_are_flushed_by_the_next_increment(stores, monkeypatch):
+    redis_client, mongo = stores
+    post_id = make_post(mongo)
+    monkeypatch.setenv("COUNTER_MAX_STALENESS", "30")
+    counters.increment(post_id, "read_count")
+    assert counts(mongo, post_id) == (0, 0)
+
+    redis_client.set(counters._SINCE_KEY, time.time() - 31)
+    counters.increment(post_id, "read_count")
+    assert counts(mongo, post_id) == (2, 0)
+    assert not redis_client.exists(counters._PENDING_KEY)
+
+
+def test_increment_writes_directly_when_redis_is_down(stores, monkeypatch):
+    _, mongo = stores
+    post_id = make_post(mongo)
+
+    def broken_pipeline(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(counters, "redis_pipeline", broken_pipeline)
+    counters.increment(post_id, "like_count")
+    assert counts(mongo, post_id) == (0, 1)
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, g
 import requests
 import io
 import logging
@@ -16,10 +16,20 @@ API_URL = os.getenv('API_URL')
 def get_api_url(endpoint):
     return f"{API_URL}/{endpoint}"
 
+def resolve_usernames(user_ids, headers):
+    """Look up the usernames of many users in one request, memoized for the current request."""
+    usernames = g.setdefault('usernames', {})
+    missing = {str(user_id) for user_id in user_ids if user_id is not None} - usernames.keys()
+    if missing:
+        response = requests.get(get_api_url('user/batch_info'), headers=headers, params={'user_ids': ','.join(sorted(missing)), 'fields': 'username'})
+        users = response.json().get('users', {}) if response.status_code == 200 else {}
+        for user_id in missing:
+            usernames[user_id] = users.get(user_id, {}).get('username', 'Unknown User')
+    return usernames
+
 def fetch_user_info(user_id, headers):
     """Fetch user information by user ID."""
-    response = requests.get(get_api_url(f'user/check_user_info?user_id={user_id}'), headers=headers)
-    return response.json().get('username', 'Unknown User') if response.status_code == 200 else 'Unknown User'
+    return resolve_usernames([user_id], headers).get(str(user_id), 'Unknown User')
 
 def handle_api_response(response, success_status=200):
     """Handles API responses and returns JSON or raises an error."""
@@ -101,10 +111,9 @@ def post_page():
     pagination = posts_data.get('pagination', {})
     total_pages = pagination.get('pages', 1)
     
+    resolve_usernames([post['user_id'] for post in posts], headers)
     for post in posts:
         post['username'] = fetch_user_info(post['user_id'], headers)
-        for comment in post.get('comments', []):
-            comment['username'] = fetch_user_info(comment['user_id'], headers)
 
         # Add read history
         read_history_response = requests.post(get_api_url(f'history/add_read_history'), headers=headers, params={'post_id': post['_id']})
@@ -137,6 +146,23 @@ def personal_page():
     flash('You need to login to view your personal page.', 'danger')
     return redirect(url_for('login'))
 
+@app.route('/upload_init', methods=['POST'])
+def upload_init():
+    """Get a presigned URL from the backend; the browser then uploads the file to MinIO itself."""
+    if 'token' not in session:
+        return {'message': 'Not logged in'}, 401
+    headers = {'Authorization': f'Bearer {session["token"]}'}
+    payload = {'filename': request.form.get('filename', ''), 'content_type': request.form.get('content_type', ''), 'sha256': request.form.get('sha256', '')}
+    response = requests.post(get_api_url('posts/upload_media/init'), data=payload, headers=headers)
+    return response.json(), response.status_code
+
+def attach_upload(post_id, headers):
+    """Attach a media file the browser uploaded directly to MinIO, if there is one."""
+    upload_id = request.form.get('upload_id')
+    if upload_id:
+        response = requests.post(get_api_url('posts/upload_media/complete'), headers=headers, params={'post_id': post_id}, data={'upload_id': upload_id})
+        handle_api_response(response)
+
 @app.route('/create_post', methods=['GET', 'POST'])
 def create_post():
     if 'token' in session:
@@ -154,7 +180,9 @@ def create_post():
             else:
                 response = requests.post(get_api_url('posts/create_post'), data=payload, headers=headers)
 
-            if handle_api_response(response):
+            post_data = handle_api_response(response)
+            if post_data:
+                attach_upload(post_data['post_id'], headers)
                 flash('Post created successfully!', 'success')
                 return redirect(url_for('personal_page'))
 
@@ -197,6 +225,7 @@ def edit_post(post_id):
             response = requests.put(get_api_url(f'posts/update_post?post_id={post_id}'), data=payload, headers=headers)
 
         if handle_api_response(response):
+            attach_upload(post_id, headers)
             flash('Post updated successfully!', 'success')
             return redirect(url_for('personal_page'))
 
@@ -207,16 +236,14 @@ def edit_post(post_id):
 def toggle_like(post_id):
     if 'token' in session:
         headers = {'Authorization': f'Bearer {session["token"]}'}
-        username = session.get('username')
 
-        # Get user's like history
-        user_info_response = requests.get(get_api_url('user/check_user_info'), headers=headers, params={'username': username})
+        # Check whether this post is already liked
+        liked_response = requests.get(get_api_url('history/liked'), headers=headers, params={'post_ids': post_id})
 
-        if user_info_response.status_code == 200:
-            user_info = user_info_response.json()
-            liked_posts = {like['post_id'] for like in user_info.get('likes', [])}
+        if liked_response.status_code == 200:
+            liked = liked_response.json().get('liked', {})
 
-            if post_id in liked_posts:
+            if liked.get(post_id):
                 # Unlike the post
                 unlike_response = requests.delete(get_api_url('history/remove_like'), headers=headers, params={'post_id': post_id})
 
@@ -233,7 +260,7 @@ def toggle_like(post_id):
                 else:
                     flash("An error occurred while liking the post.", "danger")
         else:
-            flash("Could not retrieve user information.", "danger")
+            flash("Could not retrieve your likes.", "danger")
 
         return redirect(url_for('view_post', post_id=post_id))
     
@@ -272,15 +299,15 @@ def about_page():
     account_created_at = user_data.get('account_created', 'Unknown Date')
     likes = user_data.get('likes', [])
 
-    # Fetch titles for liked posts
+    # Fetch titles for liked posts in one request
     liked_posts = []
-    for like in likes:
-        post_id = like['post_id'] 
-        post_response = requests.get(get_api_url(f'posts/get_post'), headers=headers, params={'post_id': post_id})
-        post_data = handle_api_response(post_response)
-        if post_data:
-            title = post_data['post']['title']
-            liked_posts.append({'post_id': post_id, 'title': title, 'timestamp': like['timestamp']})
+    if likes:
+        post_ids = ','.join(like['post_id'] for like in likes)
+        posts_response = requests.get(get_api_url('posts/get_posts_by_ids'), headers=headers, params={'post_ids': post_ids, 'fields': 'title'})
+        liked = (handle_api_response(posts_response) or {}).get('posts', [])
+        for like, post in zip(likes, liked):
+            if post:
+                liked_posts.append({'post_id': like['post_id'], 'title': post['title'], 'timestamp': like['timestamp']})
 
     user_id_response = requests.get(get_api_url(f'user/check_user_info?username={username}'))
     user_id = handle_api_response(user_id_response).get('user_id')
@@ -346,21 +373,20 @@ def top_posts():
     
     print("debug2")
     posts = []
-    for post_id in post_ids:
-        post_response = requests.get(get_api_url('posts/get_post'), headers=headers, params={'post_id': post_id})
-        post_data = handle_api_response(post_response)
-
+    top = []
+    if post_ids:
+        posts_response = requests.get(get_api_url('posts/get_posts_by_ids'), headers=headers, params={'post_ids': ','.join(post_ids)})
+        top = (handle_api_response(posts_response) or {}).get('posts', [])
+    resolve_usernames([post['user_id'] for post in top if post], headers)
+    for post_id, post in zip(post_ids, top):
         # Add read history
         read_history_response = requests.post(get_api_url(f'history/add_read_history'), headers=headers, params={'post_id': post_id})
         if read_history_response.status_code != 200:
             print(f"Failed to add read history for post")
 
-        if post_data:
-            user_id = post_data['post']['user_id']
-            post_data['username'] = fetch_user_info(user_id, headers)
-            posts.append(post_data)
+        if post:
+            posts.append({'post': post, 'username': fetch_user_info(post['user_id'], headers)})
 
-        
 
     return render_template('top.html', posts=posts)
 
@@ -372,12 +398,18 @@ def view_post(post_id):
     post_data = handle_api_response(post_response)
     post = post_data.get('post')
     user_id = post['user_id']
-    post['username'] = fetch_user_info(user_id, headers)
 
-    for comment in post.get('comments', []):
+    comments_cursor = request.args.get('comments_cursor', '')
+    comments_response = requests.get(get_api_url('posts/get_comments'), headers=headers, params={'post_id': post_id, 'cursor': comments_cursor})
+    comments_data = handle_api_response(comments_response) or {}
+    post['comments'] = comments_data.get('comments', [])
+    # the author and every commenter in one lookup
+    resolve_usernames([user_id] + [comment['user_id'] for comment in post['comments']], headers)
+    post['username'] = fetch_user_info(user_id, headers)
+    for comment in post['comments']:
         comment['username'] = fetch_user_info(comment['user_id'], headers)
 
-    return render_template('viewpost.html', post=post)
+    return render_template('viewpost.html', post=post, next_comments_cursor=comments_data.get('next_cursor'))
 
 @app.route('/search', methods=['GET'])
 def search_posts():
@@ -392,10 +424,9 @@ def search_posts():
     posts_data = handle_api_response(response)
     posts = posts_data.get('posts', [])
 
+    resolve_usernames([post['user_id'] for post in posts], headers)
     for post in posts:
         post['username'] = fetch_user_info(post['user_id'], headers)
-        for comment in post.get('comments', []):
-            comment['username'] = fetch_user_info(comment['user_id'], headers)
 
     return render_template('search_results.html', posts=posts, search_query=search_query)
 